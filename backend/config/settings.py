@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 
@@ -61,6 +62,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "shortener.middleware.MetricsMiddleware",
+    "shortener.middleware.ProfilingMiddleware",
+    "shortener.middleware.DatabasePinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -120,6 +124,55 @@ else:
         }
     }
 
+# Pool de conexoes do psycopg 3 (psycopg[pool]): cada worker mantem de
+# DATABASE_POOL_MIN_SIZE a DATABASE_POOL_MAX_SIZE conexoes abertas e as
+# empresta por requisicao. Com pool, conn_max_age precisa ser 0.
+DATABASE_POOL = config("DATABASE_POOL", default=False, cast=bool)
+DATABASE_POOL_MIN_SIZE = config("DATABASE_POOL_MIN_SIZE", default=2, cast=int)
+DATABASE_POOL_MAX_SIZE = config("DATABASE_POOL_MAX_SIZE", default=10, cast=int)
+# Segundos esperando uma conexao livre antes de falhar a requisicao.
+DATABASE_POOL_TIMEOUT = config("DATABASE_POOL_TIMEOUT", default=10, cast=float)
+
+# Replicas de leitura (URLs separadas por virgula). Leituras vao para uma
+# replica com atraso ate DATABASE_REPLICA_MAX_LAG segundos; escritas e leituras
+# depois de uma escrita ficam no primario (shortener.routers.ReplicaRouter).
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+DATABASE_REPLICA_MAX_LAG = config("DATABASE_REPLICA_MAX_LAG", default=5, cast=float)
+# Intervalo (segundos) entre medicoes do atraso de cada replica, por processo.
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = config(
+    "DATABASE_REPLICA_LAG_CHECK_INTERVAL", default=2, cast=float
+)
+# Limite (segundos) para abrir conexao com uma replica: a medicao do atraso roda
+# dentro da requisicao, e uma replica fora do ar nao pode segura-la.
+DATABASE_REPLICA_CONNECT_TIMEOUT = config("DATABASE_REPLICA_CONNECT_TIMEOUT", default=2, cast=int)
+# Depois de POST/PUT/PATCH/DELETE, o cliente le do primario por este tempo
+# (cookie), para enxergar a propria escrita mesmo com a replica atrasada.
+DATABASE_PIN_SECONDS = config("DATABASE_PIN_SECONDS", default=10, cast=int)
+
+for index, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    replica = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    if replica["ENGINE"] == "django.db.backends.postgresql":
+        replica.setdefault("OPTIONS", {})["connect_timeout"] = DATABASE_REPLICA_CONNECT_TIMEOUT
+    # Nos testes a replica e o proprio banco de teste do primario.
+    replica["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica_{index}"] = replica
+
+for alias, database in DATABASES.items():
+    if DATABASE_POOL and database["ENGINE"] == "django.db.backends.postgresql":
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            # Replica fora do ar nao pode segurar a requisicao esperando o pool.
+            "timeout": (
+                DATABASE_REPLICA_CONNECT_TIMEOUT
+                if alias.startswith("replica_")
+                else DATABASE_POOL_TIMEOUT
+            ),
+        }
+
+DATABASE_ROUTERS = ["shortener.routers.ReplicaRouter"] if DATABASE_REPLICA_URLS else []
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -163,6 +216,15 @@ STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
+    # QR Codes com nome pelo sha256 (shortener.storage). Para S3/MinIO:
+    # QR_STORAGE_BACKEND=storages.backends.s3.S3Storage (pacote django-storages)
+    # e QR_STORAGE_OPTIONS='{"bucket_name": "...", "endpoint_url": "..."}'.
+    "qrcodes": {
+        "BACKEND": config(
+            "QR_STORAGE_BACKEND", default="django.core.files.storage.FileSystemStorage"
+        ),
+        "OPTIONS": config("QR_STORAGE_OPTIONS", default="{}", cast=json.loads),
+    },
     "staticfiles": {
         "BACKEND": (
             "whitenoise.storage.CompressedManifestStaticFilesStorage"
@@ -181,6 +243,9 @@ WHITENOISE_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Cliques arquivados pelo comando archive_clicks (NDJSON + gzip por dia e URL)
+CLICK_ARCHIVE_ROOT = config("CLICK_ARCHIVE_ROOT", default=str(BASE_DIR / "archive"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -207,6 +272,103 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache
+# Com REDIS_URL, todos os workers usam o mesmo cache (redirecionamento, limite
+# de requisicoes, analytics) e a invalidacao de um vale para todos. Sem ele,
+# cada processo tem o seu LocMemCache.
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Shortener Settings
+
+# Cache-Control (segundos) das paginas de bloqueio do redirecionamento.
+BLOCKED_PAGE_MAX_AGE = config("BLOCKED_PAGE_MAX_AGE", default=60, cast=int)
+
+# Validade (segundos) das entradas do cache de redirecionamento (shortener.cache).
+# Sem REDIS_URL o cache e por processo e a invalidacao so alcanca o worker que
+# fez a escrita: os demais podem redirecionar um link desativado, expirado ou
+# apagado por ate REDIRECT_CACHE_TIMEOUT segundos, por isso o padrao e curto.
+REDIRECT_CACHE_TIMEOUT = config("REDIRECT_CACHE_TIMEOUT", default=300 if REDIS_URL else 5, cast=int)
+
+# Aquecimento do cache ao iniciar cada worker do gunicorn: os N links ativos
+# mais clicados (0 desativa), em no maximo BUDGET segundos.
+REDIRECT_CACHE_WARM_SIZE = config("REDIRECT_CACHE_WARM_SIZE", default=1000, cast=int)
+REDIRECT_CACHE_WARM_BUDGET = config("REDIRECT_CACHE_WARM_BUDGET", default=2, cast=float)
+
+# Tabela de links sem teto em memoria, por processo (shortener.linktable).
+# Alteracoes levam ate LINK_TABLE_REFRESH_INTERVAL segundos para valer; a
+# tabela e reconstruida a cada LINK_TABLE_FULL_REFRESH s ou com deltas demais.
+LINK_TABLE_ENABLED = config("LINK_TABLE_ENABLED", default=False, cast=bool)
+LINK_TABLE_REFRESH_INTERVAL = config("LINK_TABLE_REFRESH_INTERVAL", default=5, cast=float)
+LINK_TABLE_FULL_REFRESH = config("LINK_TABLE_FULL_REFRESH", default=3600, cast=float)
+LINK_TABLE_MAX_DELTA = config("LINK_TABLE_MAX_DELTA", default=50000, cast=int)
+
+# Registro de alteracoes de links (LinkChange). Lacunas de seq mais novas que
+# LINK_CHANGE_GAP_GRACE segundos podem ser transacoes ainda abertas: o cursor
+# dos consumidores para antes delas. O sweep_links apaga o que passou da retencao.
+LINK_CHANGE_GAP_GRACE = config("LINK_CHANGE_GAP_GRACE", default=10, cast=float)
+LINK_CHANGE_RETENTION_DAYS = config("LINK_CHANGE_RETENTION_DAYS", default=7, cast=int)
+
+# Limite por IP e por rota no formato "<requisicoes>/<s|m|h|d>"; vazio desativa.
+RATE_LIMITS = {
+    "redirect": config("RATE_LIMIT_REDIRECT", default="600/m"),
+    "create": config("RATE_LIMIT_CREATE", default="60/m"),
+}
+# Proxies reversos confiaveis na frente do backend (nginx, balanceador do Render).
+# Com 0 o X-Forwarded-For e ignorado e o IP do cliente e o REMOTE_ADDR.
+TRUSTED_PROXY_COUNT = config("TRUSTED_PROXY_COUNT", default=0, cast=int)
+# "memory" conta por processo; "cache" compartilha os contadores entre workers via CACHES.
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="memory")
+
+# Acessos de robos/previas contam em bot_clicks; 1 a cada N vira linha de Click (0 = nenhum).
+BOT_CLICK_SAMPLE_RATE = config("BOT_CLICK_SAMPLE_RATE", default=0, cast=int)
+
+# Cliques repetidos gravados como Click: 1 a cada N, com peso N (1 = todos). Os
+# contadores total/unique continuam exatos. Cada link pode sobrescrever (click_sample_rate).
+CLICK_SAMPLE_RATE = config("CLICK_SAMPLE_RATE", default=1, cast=int)
+
+# Entradas do LRU em processo de user agents/referers internados (por tabela).
+INTERN_CACHE_SIZE = config("INTERN_CACHE_SIZE", default=10000, cast=int)
+
+# Arquivo gerado pelo compile_geoip (IP -> pais, lido via mmap); vazio desativa.
+GEOIP_DATABASE = config("GEOIP_DATABASE", default="")
+
+# Validade (segundos) do resultado de /api/urls/{code}/analytics/ no cache, por link.
+ANALYTICS_CACHE_TIMEOUT = config("ANALYTICS_CACHE_TIMEOUT", default=60, cast=int)
+
+# Metricas em /metrics (formato Prometheus). Com varios workers, METRICS_DIR
+# guarda o retrato de cada processo (gravado a cada METRICS_FLUSH_INTERVAL s).
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=5, cast=float)
+# /metrics exige o cabecalho "Authorization: Bearer <token>"; sem token o
+# endpoint fica desligado (404), mesmo com METRICS_ENABLED.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Perfil de requisicoes (shortener.middleware.ProfilingMiddleware). Desligado, o
+# middleware nem e carregado. Com ligado, perfila quem envia "X-Profile: <token>"
+# e uma fracao PROFILING_SAMPLE_RATE (0.0 a 1.0) das demais.
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+# "sampler" (pilhas collapsed, para flamegraph/speedscope) ou "cprofile" (.prof)
+PROFILING_MODE = config("PROFILING_MODE", default="sampler")
+PROFILING_INTERVAL = config("PROFILING_INTERVAL", default=0.001, cast=float)
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+
 if not DEBUG:
     SECURE_SSL_REDIRECT = False
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
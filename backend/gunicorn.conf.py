@@ -0,0 +1,81 @@
+"""
+Configuração do gunicorn, lida automaticamente do diretório de trabalho
+(/app na imagem). As opções da linha de comando do Dockerfile têm precedência.
+"""
+
+import logging
+import os
+import time
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _load_link_table():
+    from django.conf import settings
+
+    from shortener.linktable import load_link_table
+
+    if not settings.LINK_TABLE_ENABLED:
+        return
+    start = time.monotonic()
+    table = load_link_table()
+    logger.info(
+        "Tabela de links carregada: %d links, %.1f MB em %.2fs",
+        len(table),
+        table.nbytes() / 1024 / 1024,
+        time.monotonic() - start,
+    )
+
+
+def when_ready(server):
+    # Com --preload a aplicação já está carregada no processo mestre: a tabela
+    # de links montada aqui é herdada pelos workers e compartilhada por
+    # copy-on-write, em vez de uma cópia por worker.
+    if not server.cfg.preload_app:
+        return
+    from django.db import DatabaseError, connections
+
+    try:
+        _load_link_table()
+    except DatabaseError:
+        # Cada worker tenta de novo no post_worker_init.
+        logger.exception("Falha ao carregar a tabela de links")
+    finally:
+        # Nenhuma conexão aberta pode atravessar o fork.
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    # A aplicação já está carregada neste ponto: aquece o cache de
+    # redirecionamento antes do worker aceitar a primeira conexão.
+    from django.db import DatabaseError, connections
+
+    from shortener.cache import warm_redirect_cache
+    from shortener.linktable import get_link_table
+
+    start = time.monotonic()
+    try:
+        if get_link_table() is None:
+            _load_link_table()
+        warmed = warm_redirect_cache()
+    except DatabaseError:
+        # Banco indisponível não impede o worker de subir; o cache enche sob demanda.
+        logger.exception("Falha ao aquecer o cache de redirecionamento")
+        return
+    finally:
+        # Requisições abrem a própria conexão (ou pegam uma do pool).
+        connections.close_all()
+    logger.info(
+        "Cache de redirecionamento aquecido: %d links em %.2fs",
+        warmed,
+        time.monotonic() - start,
+    )
+
+
+def child_exit(server, worker):
+    # Roda no mestre, depois que o worker saiu (e gravou o retrato final no
+    # atexit): sem isso o arquivo dele seguiria somando em /metrics para sempre.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from shortener.metrics import remove_process_file
+
+    remove_process_file(worker.pid)
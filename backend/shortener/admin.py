@@ -4,16 +4,52 @@ Configuração administrativa do Django para aplicativo de encurtamento de URLs.
 Este módulo personaliza a interface administrativa do Django para gerenciar URLs encurtadas e cliques com recursos avançados como edição em linha filtro e ações personalizadas.
 """
 
+from functools import lru_cache
+
 from django.contrib import admin
-from django.db.models import Count, Q
+from django.contrib.admin.views.main import PAGE_VAR
+from django.db.models import Count, Q, Sum
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
+from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from .bulk import delete_links, set_links_active
 from .models import Click, ShortenedURL
+from .paginators import EstimatedCountPaginator
+from .utils import pack_ip
+
+RECENT_CLICKS = 10
+
+
+@lru_cache(maxsize=None)
+def _panel_template(name):
+    # Compilado uma vez por processo, também com DEBUG (sem o loader em cache).
+    return get_template(f"admin/shortener/shortenedurl/{name}")
+
+
+def _render_panel(name, context):
+    return mark_safe(_panel_template(name).render(context))
+
+
+def _recent_clicks(obj):
+    """Últimos cliques da URL, buscados uma única vez por objeto (uma consulta)."""
+    if not hasattr(obj, "_recent_clicks"):
+        obj._recent_clicks = list(
+            obj.clicks.select_related("user_agent_ref", "referer_ref").order_by("-clicked_at")[
+                :RECENT_CLICKS
+            ]
+        )
+    return obj._recent_clicks
+
+
+def _truncate(value, length):
+    if not value:
+        return "-"
+    return value[:length] + "..." if len(value) > length else value
 
 
 @admin.register(ShortenedURL)
@@ -48,6 +84,11 @@ class ShortenedURLAdmin(admin.ModelAdmin):
         - activate_selected: Ativa URLs selecionadas
         - deactivate_selected: Desativa URLs selecionadas
         - delete_expired_urls: Remove URLs expiradas do banco
+        - audit_click_counters: Confere os contadores contra a tabela de cliques
+
+    A listagem usa os contadores desnormalizados (total_clicks, unique_clicks)
+    e contagem estimada na paginação; a agregação sobre Click só roda sob
+    demanda, na ação de auditoria, para as URLs selecionadas.
     """
 
     list_display = [
@@ -61,6 +102,7 @@ class ShortenedURLAdmin(admin.ModelAdmin):
     ]
 
     list_filter = [
+        "state",
         "is_active",
         "created_at",
         "expires_at",
@@ -73,6 +115,8 @@ class ShortenedURLAdmin(admin.ModelAdmin):
         "short_code",
         "total_clicks",
         "unique_clicks",
+        "bot_clicks",
+        "state",
         "qr_code",
         "qr_code_large",
         "short_url_full",
@@ -85,7 +129,15 @@ class ShortenedURLAdmin(admin.ModelAdmin):
     date_hierarchy = "created_at"
     ordering = ["-created_at"]
 
-    actions = ["activate_selected", "deactivate_selected", "delete_expired_urls"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    actions = [
+        "activate_selected",
+        "deactivate_selected",
+        "delete_expired_urls",
+        "audit_click_counters",
+    ]
 
     fieldsets = (
         (
@@ -102,14 +154,20 @@ class ShortenedURLAdmin(admin.ModelAdmin):
         (
             "Configuracoes",
             {
-                "fields": ("is_active", "expires_at", "max_clicks"),
+                "fields": ("is_active", "expires_at", "max_clicks", "click_sample_rate"),
                 "description": "Configure as restricoes do link",
             },
         ),
         (
             "Estatisticas",
             {
-                "fields": ("total_clicks", "unique_clicks", "access_status_display"),
+                "fields": (
+                    "total_clicks",
+                    "unique_clicks",
+                    "bot_clicks",
+                    "state",
+                    "access_status_display",
+                ),
                 "description": "Contadores de cliques",
             },
         ),
@@ -130,13 +188,6 @@ class ShortenedURLAdmin(admin.ModelAdmin):
         ),
     )
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            clicks_count=Count("clicks"),
-            unique_ips_count=Count("clicks__ip_address", distinct=True),
-        )
-
     def original_url_truncated(self, obj):
         url = obj.original_url
         if len(url) > 50:
@@ -188,25 +239,12 @@ class ShortenedURLAdmin(admin.ModelAdmin):
 
     def click_stats(self, obj):
         total = obj.total_clicks
-        unique = obj.unique_clicks
-
         max_clicks = obj.max_clicks if obj.max_clicks else 100
         percentage = min(int((total / max_clicks) * 100), 100) if max_clicks else 0
 
-        return format_html(
-            """
-            <div style="width: 120px;">
-                <div style="margin-bottom: 2px;">
-                    <strong>{}</strong> total | <strong>{}</strong> únicos
-                </div>
-                <div style="width: 100%; background: #e9ecef; border-radius: 3px; height: 6px;">
-                  <div style="width: {}%; background: #007bff; height: 6px; border-radius: 3px;"></div>
-                </div>
-            </div>
-            """,
-            total,
-            unique,
-            percentage,
+        return _render_panel(
+            "click_stats.html",
+            {"total": total, "unique": obj.unique_clicks, "percentage": percentage},
         )
 
     click_stats.short_description = "Cliques"
@@ -258,103 +296,38 @@ class ShortenedURLAdmin(admin.ModelAdmin):
     def access_status_display(self, obj):
         can_access, message = obj.can_be_accessed()
 
-        status_color = "#28a745" if can_access else "#dc3545"
-        status_text = "✓ Acessível" if can_access else "✗ Inacessível"
-
-        return format_html(
-            """
-            <table style="width: 100%; border-collapse: collapse;">
-                <tr style="background: {}; color: white;">
-                    <th colspan="2" style="padding: 8px; text-align: left;">{}</th>
-                </tr>
-                <tr>
-                    <td style="padding: 6px; border: 1px solid #ddd;"><strong>Mensagem:</strong></td>
-                    <td style="padding: 6px; border: 1px solid #ddd;">{}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 6px; border: 1px solid #ddd;"><strong>Ativo:</strong></td>
-                    <td style="padding: 6px; border: 1px solid #ddd;">{}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 6px; border: 1px solid #ddd;"><strong>Expirado:</strong></td>
-                    <td style="padding: 6px; border: 1px solid #ddd;">{}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 6px; border: 1px solid #ddd;"><strong>Limite Atingido:</strong></td>
-                    <td style="padding: 6px; border: 1px solid #ddd;">{}</td>
-                </tr>
-            </table>
-            """,
-            status_color,
-            status_text,
-            message,
-            "✓ Sim" if obj.is_active else "✗ Não",
-            "✓ Sim" if obj.is_expired() else "✗ Não",
-            "✓ Sim" if obj.has_reached_max_clicks() else "✗ Não",
+        return _render_panel(
+            "access_status.html",
+            {
+                "can_access": can_access,
+                "message": message,
+                "is_active": obj.is_active,
+                "is_expired": obj.is_expired(),
+                "reached_max_clicks": obj.has_reached_max_clicks(),
+            },
         )
 
     access_status_display.short_description = "Status de Acesso Detalhado"
 
     def recent_clicks_display(self, obj):
-        clicks = obj.clicks.all().order_by("-clicked_at")[:10]
-
-        if not clicks.exists():
-            return mark_safe(
-                '<p style="color: #999; font-style: italic;">Nenhum clique registrado ainda</p>'
-            )
-
-        html = """
-        <table style="width: 100%; border-collapse: collapse; font-size: 12px;">
-            <thead>
-                <tr style="background: #f8f9fa; text-align: left;">
-                    <th style="padding: 8px; border: 1px solid #dee2e6;">Data/Hora</th>
-                    <th style="padding: 8px; border: 1px solid #dee2e6;">IP</th>
-                    <th style="padding: 8px; border: 1px solid #dee2e6;">User Agent</th>
-                    <th style="padding: 8px; border: 1px solid #dee2e6;">Referer</th>
-                </tr>
-            </thead>
-            <tbody>
-        """
-
-        for click in clicks:
-            user_agent = (
-                (click.user_agent[:50] + "..." if len(click.user_agent) > 50 else click.user_agent)
-                if click.user_agent
-                else "-"
-            )
-            referer = (
-                (click.referer[:40] + "..." if len(click.referer) > 40 else click.referer)
-                if click.referer
-                else "-"
-            )
-
-            html += f"""
-                <tr>
-                    <td style="padding: 6px; border: 1px solid #dee2e6;">
-                        {click.clicked_at.strftime("%d/%m/%Y %H:%M:%S")}
-                    </td>
-                    <td style="padding: 6px; border: 1px solid #dee2e6;">{click.ip_address}</td>
-                    <td style="padding: 6px; border: 1px solid #dee2e6;" title="{click.user_agent}">
-                        {user_agent}
-                    </td>
-                    <td style="padding: 6px; border: 1px solid #dee2e6;" title="{click.referer}">
-                        {referer}
-                    </td>
-                </tr>
-            """
-
-        html += "</tbody></table>"
-
-        total_clicks = obj.clicks.count()
-        if total_clicks > 10:
-            html += f'<p style="margin-top: 10px; color: #6c757d; font-size: 11px;">Mostrando 10 de {total_clicks} cliques totais</p>'
-
-        return mark_safe(html)
+        rows = [
+            {
+                "clicked_at": click.clicked_at.strftime("%d/%m/%Y %H:%M:%S"),
+                "ip_address": click.ip_address,
+                "user_agent": click.user_agent,
+                "user_agent_short": _truncate(click.user_agent, 50),
+                "referer": click.referer or "",
+                "referer_short": _truncate(click.referer, 40),
+            }
+            for click in _recent_clicks(obj)
+        ]
+        # Rodapé pelo contador desnormalizado: nenhum COUNT sobre Click.
+        return _render_panel("recent_clicks.html", {"rows": rows, "total_clicks": obj.total_clicks})
 
     recent_clicks_display.short_description = "Ultimos 10 Cliques"
 
     def activate_selected(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = set_links_active(queryset, True)
         self.message_user(
             request,
             f"{updated} URL(s) ativada(s) com sucesso.",
@@ -364,7 +337,7 @@ class ShortenedURLAdmin(admin.ModelAdmin):
     activate_selected.short_description = "✓ Ativar URLs selecionadas"
 
     def deactivate_selected(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = set_links_active(queryset, False)
         self.message_user(
             request,
             f"{updated} URL(s) desativada(s) com sucesso.",
@@ -374,13 +347,13 @@ class ShortenedURLAdmin(admin.ModelAdmin):
     deactivate_selected.short_description = "● Desativar URLs selecionadas"
 
     def delete_expired_urls(self, request, queryset):
-        expired = queryset.filter(expires_at__lt=timezone.now())
-        count = expired.count()
-        if count > 0:
-            expired.delete()
+        # Em lotes e sem o coletor de cascata; para a tabela inteira, use
+        # "manage.py bulk_links delete --expired" fora da requisição.
+        links, clicks = delete_links(queryset.filter(expires_at__lt=timezone.now()))
+        if links > 0:
             self.message_user(
                 request,
-                f"{count} URL(s) expirada(s) deletada(s).",
+                f"{links} URL(s) expirada(s) deletada(s), com {clicks} clique(s).",
                 level="success",
             )
         else:
@@ -392,6 +365,69 @@ class ShortenedURLAdmin(admin.ModelAdmin):
 
     delete_expired_urls.short_description = "🗑 Deletar URLs expiradas"
 
+    def delete_queryset(self, request, queryset):
+        # A ação padrão "delete_selected" chega aqui: queryset.delete() não
+        # registraria o LinkChange nem limparia o cache de redirecionamento.
+        delete_links(queryset)
+
+    def audit_click_counters(self, request, queryset):
+        # Cliques de pessoas somando o peso da amostragem; cliques já
+        # arquivados (archive_clicks) saem da tabela e aparecem como diferença.
+        human = Q(clicks__client_class=Click.ClientClass.HUMAN)
+        rows = queryset.order_by().annotate(
+            stored_clicks=Sum("clicks__weight", filter=human, default=0),
+            stored_ips=Count("clicks__ip", filter=human, distinct=True),
+        )
+
+        divergent = []
+        audited = 0
+        for url in rows:
+            audited += 1
+            if url.stored_clicks != url.total_clicks or url.stored_ips != url.unique_clicks:
+                divergent.append(
+                    f"{url.short_code} (total {url.total_clicks}/{url.stored_clicks}, "
+                    f"únicos {url.unique_clicks}/{url.stored_ips})"
+                )
+
+        if divergent:
+            self.message_user(
+                request,
+                f"{len(divergent)} de {audited} URL(s) com contadores diferentes dos cliques "
+                f"gravados (contador/tabela): {'; '.join(divergent)}",
+                level="warning",
+            )
+        else:
+            self.message_user(
+                request,
+                f"Contadores de {audited} URL(s) conferem com a tabela de cliques.",
+                level="success",
+            )
+
+    audit_click_counters.short_description = "🔍 Auditar contadores de cliques"
+
+
+class ClickCursorFilter(admin.SimpleListFilter):
+    """Cursor por id: "?before=<id>" lista os cliques mais antigos que ele."""
+
+    title = "Navegação"
+    parameter_name = "before"
+
+    def lookups(self, request, model_admin):
+        if self.value():
+            return [(self.value(), f"Anteriores ao clique #{self.value()}")]
+        return []
+
+    def has_output(self):
+        # Sem opções na barra lateral o filtro nem seria aplicado.
+        return True
+
+    def queryset(self, request, queryset):
+        try:
+            before = int(self.value() or 0)
+        except ValueError:
+            return queryset.none()
+        return queryset.filter(pk__lt=before) if before else queryset
+
 
 @admin.register(Click)
 class ClickAdmin(admin.ModelAdmin):
@@ -400,10 +436,11 @@ class ClickAdmin(admin.ModelAdmin):
 
     Funcionalidades:
         - Exibição de lista com informações do clique
-        - Filtros por data e URL
-        - Busca por código curto da URL, IP e user agent
+        - Filtro por origem (pessoa, prévia, robô) e por data (faixas sobre índices)
+        - Busca por código curto exato da URL e IP exato
+        - Navegação por cursor (?before=<id>) em vez de OFFSET
+        - Contagem estimada na paginação
         - Campos somente leitura (cliques são imutáveis)
-        - Hierarquia de datas para navegação temporal
         - Formatação especial do user agent e referer
         - Link direto para a URL associada no admin
 
@@ -416,11 +453,19 @@ class ClickAdmin(admin.ModelAdmin):
     list_display = [
         "url",
         "ip_address",
+        "country",
+        "client_class",
         "clicked_at_formatted",
         "referer_display",
     ]
-    list_filter = ["clicked_at", "url"]
-    search_fields = ["url__short_code", "ip_address", "user_agent"]
+    # A tabela chega a centenas de milhões de linhas: só filtros que usam
+    # índice (client_class e clicked_at têm um índice composto), nada de filtro
+    # por URL (carregaria todas na barra lateral) nem busca por substring.
+    list_filter = [ClickCursorFilter, "client_class", "clicked_at"]
+    search_fields = ["=url__short_code"]
+    list_select_related = ["url", "referer_ref"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = [
         "url",
         "url_link",
@@ -428,11 +473,15 @@ class ClickAdmin(admin.ModelAdmin):
         "user_agent",
         "user_agent_formatted",
         "referer",
+        "client_class",
+        "weight",
+        "country",
         "clicked_at",
     ]
 
-    date_hierarchy = "clicked_at"
-    ordering = ["-clicked_at"]
+    # Sem date_hierarchy: o nível de anos faz SELECT DISTINCT na tabela inteira.
+    # A ordem por pk segue a de clicked_at (auto_now_add) e sustenta o cursor.
+    ordering = ["-pk"]
 
     fieldsets = (
         (
@@ -444,7 +493,15 @@ class ClickAdmin(admin.ModelAdmin):
         (
             "Dados do Visitante",
             {
-                "fields": ("ip_address", "user_agent", "user_agent_formatted", "referer"),
+                "fields": (
+                    "ip_address",
+                    "user_agent",
+                    "user_agent_formatted",
+                    "referer",
+                    "client_class",
+                    "weight",
+                    "country",
+                ),
             },
         ),
     )
@@ -452,6 +509,26 @@ class ClickAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         return False
 
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, "context_data", {}).get("cl")
+        if changelist is not None and changelist.result_list:
+            # Último id da página: a próxima começa depois dele, sem OFFSET.
+            last_pk = changelist.result_list[len(changelist.result_list) - 1].pk
+            response.context_data["next_cursor_url"] = changelist.get_query_string(
+                {ClickCursorFilter.parameter_name: last_pk}, [PAGE_VAR]
+            )
+        return response
+
+    def get_search_results(self, request, queryset, search_term):
+        # O IP fica em binario: a busca so casa o endereco exato.
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        try:
+            packed = pack_ip(search_term.strip())
+        except ValueError:
+            return results, may_have_duplicates
+        return results | queryset.filter(ip=packed), may_have_duplicates
+
     def url_link(self, obj):
         url_admin = reverse("admin:shortener_shortenedurl_change", args=[obj.url.pk])
         return format_html(
@@ -0,0 +1,93 @@
+"""
+Agregações de cliques por link para o endpoint analytics/.
+
+Cada bloco é um único GROUP BY sobre Click (somando weight, por causa da
+amostragem) — nenhuma linha de clique é percorrida em Python. O resultado
+fica no cache por ANALYTICS_CACHE_TIMEOUT segundos, para que painéis que
+consultam o endpoint em intervalo curto não repitam as agregações.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from .utils import format_ip_prefix
+
+
+def analytics_cache_key(url_id, top, client_class):
+    return f"shortener:analytics:{url_id}:{top}:{client_class or 'all'}"
+
+
+def _top(clicks, field, top):
+    return clicks.values(field).annotate(clicks=Sum("weight")).order_by("-clicks", field)[:top]
+
+
+def compute_link_analytics(url, top=10, client_class=None):
+    """Referências, navegadores, países, prefixos de IP e distribuição por hora."""
+    clicks = url.clicks.order_by()
+    if client_class:
+        clicks = clicks.filter(client_class=client_class)
+
+    hourly = dict(
+        clicks.annotate(hour=ExtractHour("clicked_at", tzinfo=timezone.get_current_timezone()))
+        .values("hour")
+        .annotate(clicks=Sum("weight"))
+        .values_list("hour", "clicks")
+    )
+
+    return {
+        "short_code": url.short_code,
+        "total_clicks": url.total_clicks,
+        "unique_clicks": url.unique_clicks,
+        "bot_clicks": url.bot_clicks,
+        "client_class": client_class,
+        # Sem referência (acesso direto) aparece como domain null.
+        "top_referers": [
+            {"domain": row["referer_ref__domain"], "clicks": row["clicks"]}
+            for row in _top(clicks, "referer_ref__domain", top)
+        ],
+        "top_browsers": [
+            {"family": row["user_agent_ref__family"], "clicks": row["clicks"]}
+            for row in _top(clicks, "user_agent_ref__family", top)
+        ],
+        # Sem base GeoIP (ou IP fora dela) aparece como country null.
+        "top_countries": [
+            {"country": row["country"] or None, "clicks": row["clicks"]}
+            for row in _top(clicks, "country", top)
+        ],
+        "top_ip_prefixes": [
+            {"prefix": format_ip_prefix(row["ip_prefix"]), "clicks": row["clicks"]}
+            for row in _top(clicks, "ip_prefix", top)
+        ],
+        "hourly": [{"hour": hour, "clicks": hourly.get(hour, 0)} for hour in range(24)],
+        "generated_at": timezone.now(),
+    }
+
+
+def ip_prefixes_cache_key(url_id, top):
+    return f"shortener:analytics:{url_id}:ip_prefixes:{top}"
+
+
+def get_top_ip_prefixes(url, top=10):
+    """Prefixos de IP com mais cliques do link (usado em statistics/), com o mesmo cache."""
+    key = ip_prefixes_cache_key(url.pk, top)
+    data = cache.get(key)
+    if data is None:
+        data = [
+            {"prefix": format_ip_prefix(row["ip_prefix"]), "clicks": row["clicks"]}
+            for row in _top(url.clicks.order_by(), "ip_prefix", top)
+        ]
+        cache.set(key, data, settings.ANALYTICS_CACHE_TIMEOUT)
+    return data
+
+
+def get_link_analytics(url, top=10, client_class=None):
+    """compute_link_analytics() com cache curto por link."""
+    key = analytics_cache_key(url.pk, top, client_class)
+    data = cache.get(key)
+    if data is None:
+        data = compute_link_analytics(url, top, client_class)
+        cache.set(key, data, settings.ANALYTICS_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,208 @@
+"""
+Arquivo histórico de cliques fora do banco.
+
+Cliques anteriores a um corte saem da tabela Click e vão para arquivos NDJSON
+compactados com gzip, particionados por dia e por URL:
+
+    <CLICK_ARCHIVE_ROOT>/<AAAA-MM-DD>/url-<id>.ndjson.gz
+
+O manifest.json na raiz guarda o corte atual; consultas que começam antes
+dele leem também os arquivos (via mmap, sem carregar o arquivo inteiro).
+Durante o arquivamento ele guarda também o último id gravado e o tamanho das
+partições antes do lote em andamento, para que uma execução interrompida possa
+ser repetida sem duplicar cliques.
+
+Só Click é arquivado: a unicidade dos cliques vem de Visitor, que continua no
+banco, então quem volta depois do arquivamento segue contando como repetição.
+"""
+
+import gzip
+import json
+import mmap
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Click
+
+MANIFEST_NAME = "manifest.json"
+
+
+def archive_root():
+    return Path(settings.CLICK_ARCHIVE_ROOT)
+
+
+def _read_manifest():
+    try:
+        return json.loads((archive_root() / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def archive_cutoff():
+    """Data/hora antes da qual os cliques estão no arquivo (None se nada foi arquivado)."""
+    cutoff = _read_manifest().get("cutoff")
+    return datetime.fromisoformat(cutoff) if cutoff else None
+
+
+def _write_manifest(manifest):
+    path = archive_root() / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest))
+    os.replace(tmp_path, path)
+
+
+def _discard_pending(manifest):
+    """Corta das partições o que um lote interrompido anexou antes de ser confirmado."""
+    root = archive_root()
+    for name, size in manifest.pop("pending", {}).items():
+        path = root / name
+        if not path.exists():
+            continue
+        if size:
+            os.truncate(path, size)
+        else:
+            path.unlink()
+
+
+def partition_path(day, url_id):
+    return archive_root() / day.isoformat() / f"url-{url_id}.ndjson.gz"
+
+
+def _serialize(click):
+    return {
+        "id": click.pk,
+        "url_id": click.url_id,
+        "ip_address": click.ip_address,
+        "user_agent": click.user_agent,
+        "referer": click.referer,
+        "client_class": click.client_class,
+        "weight": click.weight,
+        "country": click.country,
+        "clicked_at": click.clicked_at.isoformat(),
+    }
+
+
+def archive_clicks(cutoff, batch_size=5000, progress=None):
+    """
+    Move os cliques com clicked_at < cutoff para o arquivo, em lotes.
+
+    Cada lote é anexado às partições (um membro gzip por partição) e confirmado
+    no manifest — com o novo corte e o maior id do lote — antes de ser apagado
+    do banco. Se a execução cair no meio, a próxima corta das partições o lote
+    não confirmado e só apaga, sem regravar, os cliques já confirmados.
+    Retorna o total de cliques arquivados.
+    """
+    manifest = _read_manifest()
+    _discard_pending(manifest)
+    # Tudo antes do corte gravado já deveria estar no arquivo: o que sobrou no
+    # banco (de uma execução interrompida) é arquivado junto.
+    done_cutoff = None
+    if "cutoff" in manifest:
+        done_cutoff = datetime.fromisoformat(manifest["cutoff"])
+        cutoff = max(cutoff, done_cutoff)
+    # Cliques com clicked_at < done_cutoff e id <= last_id já foram gravados.
+    last_id = manifest.get("last_id", 0)
+
+    root = archive_root()
+    archived = 0
+    queryset = (
+        Click.objects.filter(clicked_at__lt=cutoff)
+        .select_related("user_agent_ref", "referer_ref")
+        .order_by("pk")
+    )
+    while True:
+        batch = list(queryset[:batch_size])
+        if not batch:
+            break
+
+        partitions = {}
+        for click in batch:
+            if click.pk <= last_id and click.clicked_at < done_cutoff:
+                continue
+            day = timezone.localdate(click.clicked_at)
+            partitions.setdefault(partition_path(day, click.url_id), []).append(_serialize(click))
+
+        manifest["pending"] = {
+            str(path.relative_to(root)): path.stat().st_size if path.exists() else 0
+            for path in partitions
+        }
+        _write_manifest(manifest)
+        for path, records in partitions.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(path, "at", encoding="utf-8") as handle:
+                handle.writelines(json.dumps(record) + "\n" for record in records)
+        manifest = {"cutoff": cutoff.isoformat(), "last_id": batch[-1].pk}
+        _write_manifest(manifest)
+
+        Click.objects.filter(pk__in=[click.pk for click in batch]).delete()
+        archived += len(batch)
+        if progress:
+            progress(archived)
+
+    # Concluído, nada abaixo do corte ficou no banco: last_id perde o sentido.
+    _write_manifest({"cutoff": cutoff.isoformat()})
+    return archived
+
+
+def _read_partition(path):
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with gzip.GzipFile(fileobj=mapped) as stream:
+                for line in stream:
+                    yield json.loads(line)
+
+
+def iter_archived_clicks(url_id, since=None, until=None):
+    """Itera os registros arquivados da URL com since <= clicked_at < until."""
+    root = archive_root()
+    if not root.is_dir():
+        return
+
+    first_day = timezone.localdate(since) if since else None
+    last_day = timezone.localdate(until) if until else None
+    for day_dir in sorted(root.iterdir()):
+        if not day_dir.is_dir():
+            continue
+        day = datetime.strptime(day_dir.name, "%Y-%m-%d").date()
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        path = day_dir / f"url-{url_id}.ndjson.gz"
+        if not path.exists():
+            continue
+        for record in _read_partition(path):
+            clicked_at = datetime.fromisoformat(record["clicked_at"])
+            if (since and clicked_at < since) or (until and clicked_at >= until):
+                continue
+            # Partições gravadas antes de o país entrar no registro não têm o campo.
+            record.setdefault("country", "")
+            yield record
+
+
+def count_clicks_in_range(url, since=None, until=None):
+    """
+    Cliques (soma dos pesos) da URL no intervalo, somando banco e arquivo.
+
+    O arquivo só é lido quando o intervalo começa antes do corte arquivado.
+    """
+    queryset = url.clicks.all()
+    if since:
+        queryset = queryset.filter(clicked_at__gte=since)
+    if until:
+        queryset = queryset.filter(clicked_at__lt=until)
+    total = queryset.aggregate(total=Sum("weight"))["total"] or 0
+
+    cutoff = archive_cutoff()
+    if cutoff is not None and (since is None or since < cutoff):
+        total += sum(
+            record["weight"]
+            for record in iter_archived_clicks(url.pk, since, min(until or cutoff, cutoff))
+        )
+    return total
@@ -0,0 +1,89 @@
+"""
+Operações em massa sobre links, em lotes de tamanho limitado.
+
+Usadas pelas ações do admin e pelo comando bulk_links. Cada lote é buscado por
+chave (pk > último pk), então a seleção nunca é carregada inteira na memória e
+cada transação fica pequena.
+
+A exclusão não passa pelo coletor de cascata do Django (que carregaria cada
+Click relacionado para apagá-lo): cliques e visitantes saem com DELETE direto
+por url_id, em blocos, e depois os links. Cada lote entra no registro de alterações
+(LinkChange) junto com a escrita.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import purge_redirect_cache
+from .models import Click, LinkChange, ShortenedURL, Visitor
+
+BULK_BATCH_SIZE = 1000
+CLICK_DELETE_BATCH_SIZE = 10000
+
+
+def _batches(queryset, batch_size):
+    """Lotes de (pk, short_code) do queryset, em ordem de pk."""
+    queryset = queryset.order_by("pk")
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).values_list("pk", "short_code")[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        yield batch
+
+
+def set_links_active(queryset, active, batch_size=BULK_BATCH_SIZE, progress=None):
+    """Ativa/desativa os links do queryset, recalculando estado e limpando o cache."""
+    updated = 0
+    for batch in _batches(queryset, batch_size):
+        pks = [pk for pk, _code in batch]
+        codes = [code for _pk, code in batch]
+        with transaction.atomic():
+            updated += ShortenedURL.objects.filter(pk__in=pks).update(
+                is_active=active, updated_at=timezone.now()
+            )
+            # Em UPDATE separado: o Case do estado precisa ler o is_active novo.
+            ShortenedURL.objects.filter(pk__in=pks).update(state=ShortenedURL.state_expression())
+            LinkChange.record(LinkChange.Kind.UPSERT, *codes)
+        purge_redirect_cache(*codes)
+        if progress:
+            progress(updated)
+    return updated
+
+
+def _delete_related(model, url_ids, batch_size):
+    deleted = 0
+    rows = model.objects.filter(url_id__in=url_ids).order_by()
+    while True:
+        pks = list(rows.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += model.objects.filter(pk__in=pks)._raw_delete(model.objects.db)
+
+
+def delete_links(
+    queryset,
+    batch_size=BULK_BATCH_SIZE,
+    click_batch_size=CLICK_DELETE_BATCH_SIZE,
+    progress=None,
+):
+    """
+    Apaga os links do queryset e seus cliques. Retorna (links, cliques) apagados.
+
+    Interrompida no meio, pode deixar links sem parte dos cliques; basta rodar
+    de novo para concluir.
+    """
+    links = clicks = 0
+    for batch in _batches(queryset, batch_size):
+        pks = [pk for pk, _code in batch]
+        codes = [code for _pk, code in batch]
+        clicks += _delete_related(Click, pks, click_batch_size)
+        _delete_related(Visitor, pks, click_batch_size)
+        with transaction.atomic():
+            links += ShortenedURL.objects.filter(pk__in=pks)._raw_delete(ShortenedURL.objects.db)
+            LinkChange.record(LinkChange.Kind.DELETE, *codes)
+        purge_redirect_cache(*codes)
+        if progress:
+            progress(links, clicks)
+    return links, clicks
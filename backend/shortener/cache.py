@@ -0,0 +1,94 @@
+"""
+Cache do caminho de redirecionamento.
+
+Guarda, por short_code, apenas os campos que o redirecionamento precisa para
+decidir entre redirecionar e bloquear. Toda escrita que altera esses campos
+deve chamar purge_redirect_cache().
+
+warm_redirect_cache() pré-carrega os links ativos mais clicados, para que um
+worker recém-iniciado não mande todos os primeiros redirecionamentos ao banco
+(chamado pelo hook post_worker_init do gunicorn.conf.py).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import REDIRECT_CACHE
+
+# Entradas gravadas por chamada a set_many() durante o aquecimento.
+WARM_BATCH_SIZE = 500
+
+REDIRECT_FIELDS = (
+    "id",
+    "short_code",
+    "original_url",
+    "is_active",
+    "expires_at",
+    "max_clicks",
+    "unique_clicks",
+    "click_sample_rate",
+    "state",
+)
+
+
+def redirect_cache_key(short_code):
+    return f"shortener:redirect:{short_code}"
+
+
+def get_redirect_entry(short_code):
+    """Retorna os campos de REDIRECT_FIELDS do link, ou None se o código não existe."""
+    key = redirect_cache_key(short_code)
+    entry = cache.get(key)
+    if entry is not None:
+        REDIRECT_CACHE.inc(result="hit")
+        return entry
+    REDIRECT_CACHE.inc(result="miss")
+
+    from .models import ShortenedURL
+
+    entry = ShortenedURL.objects.filter(short_code=short_code).values(*REDIRECT_FIELDS).first()
+    if entry is not None:
+        cache.set(key, entry, settings.REDIRECT_CACHE_TIMEOUT)
+    return entry
+
+
+def purge_redirect_cache(*short_codes):
+    if short_codes:
+        cache.delete_many([redirect_cache_key(code) for code in short_codes])
+
+
+def warm_redirect_cache(limit=None, budget=None):
+    """
+    Grava no cache os `limit` links ativos com mais cliques, lidos numa única
+    consulta. Para ao passar de `budget` segundos, para não atrasar o início do
+    worker. Retorna quantas entradas foram gravadas.
+    """
+    from .models import ShortenedURL
+
+    limit = settings.REDIRECT_CACHE_WARM_SIZE if limit is None else limit
+    budget = settings.REDIRECT_CACHE_WARM_BUDGET if budget is None else budget
+    if limit <= 0:
+        return 0
+
+    deadline = time.monotonic() + budget
+    entries = (
+        ShortenedURL.objects.filter(state=ShortenedURL.State.ACTIVE)
+        .order_by("-total_clicks")
+        .values(*REDIRECT_FIELDS)[:limit]
+    )
+    warmed = 0
+    batch = {}
+    for entry in entries.iterator(chunk_size=WARM_BATCH_SIZE):
+        batch[redirect_cache_key(entry["short_code"])] = entry
+        if len(batch) >= WARM_BATCH_SIZE:
+            cache.set_many(batch, settings.REDIRECT_CACHE_TIMEOUT)
+            warmed += len(batch)
+            batch = {}
+            if time.monotonic() >= deadline:
+                return warmed
+    if batch:
+        cache.set_many(batch, settings.REDIRECT_CACHE_TIMEOUT)
+        warmed += len(batch)
+    return warmed
@@ -0,0 +1,60 @@
+"""
+Leitura e limpeza do registro de alterações de links (LinkChange).
+
+Os seq são atribuídos no INSERT, mas as transações terminam em outra ordem:
+um seq menor pode aparecer depois de um maior já lido. Por isso o cursor
+devolvido por poll_link_changes() para antes da primeira lacuna recente
+(mais nova que LINK_CHANGE_GAP_GRACE segundos), e as linhas depois dela voltam
+na leitura seguinte. Aplicar uma alteração duas vezes não tem efeito: o
+consumidor relê o estado atual do link. Lacunas antigas são seq de transações
+desfeitas e são puladas.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import LinkChange
+
+POLL_LIMIT = 1000
+
+
+def _grace_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(seconds=settings.LINK_CHANGE_GAP_GRACE)
+
+
+def poll_link_changes(after=0, limit=POLL_LIMIT):
+    """
+    Alterações com seq maior que `after`, em ordem, e o cursor para a próxima
+    leitura (o maior seq até o qual nenhuma alteração pode mais aparecer).
+    """
+    changes = list(
+        LinkChange.objects.filter(seq__gt=after)
+        .order_by("seq")
+        .values("seq", "short_code", "kind", "changed_at")[:limit]
+    )
+    cutoff = _grace_cutoff()
+    cursor = after
+    for change in changes:
+        if change["seq"] != cursor + 1 and change["changed_at"] > cutoff:
+            break
+        cursor = change["seq"]
+    return changes, cursor
+
+
+def current_link_change_cursor():
+    """
+    Cursor para quem vai carregar o estado completo agora: alterações mais
+    novas que a carência serão lidas (e reaplicadas) pelo poll seguinte.
+    """
+    cutoff = _grace_cutoff()
+    return LinkChange.objects.filter(changed_at__lte=cutoff).aggregate(seq=Max("seq"))["seq"] or 0
+
+
+def prune_link_changes(now=None):
+    """Apaga alterações mais antigas que LINK_CHANGE_RETENTION_DAYS. Retorna quantas."""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.LINK_CHANGE_RETENTION_DAYS)
+    deleted, _per_model = LinkChange.objects.filter(changed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,150 @@
+"""
+IP -> país offline, sem serviço externo no caminho do redirecionamento.
+
+compile_geoip_database() converte um CSV de faixas (no estilo GeoIP/IP2Location)
+num arquivo binário de registros de tamanho fixo, ordenados pelo início da faixa:
+
+    cabeçalho MAGIC (8 bytes)
+    registros de 34 bytes: início (16) | fim (16) | país ISO (2)
+
+IPs são normalizados para 16 bytes (IPv4 como ::ffff:a.b.c.d), então a ordem
+dos bytes é a ordem numérica. GeoIPIndex abre o arquivo com mmap e faz bisect
+direto sobre os registros: nada é carregado na heap, e as páginas do arquivo
+ficam no cache do sistema compartilhadas entre todos os workers.
+"""
+
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+from bisect import bisect_right
+from collections.abc import Sequence
+from functools import lru_cache
+
+from django.conf import settings
+
+MAGIC = b"SGEOIP\x01\x00"
+RECORD_SIZE = 34
+_IPV4_MAPPED = bytes(10) + b"\xff\xff"
+
+logger = logging.getLogger(__name__)
+
+
+def _key(packed):
+    """IP compactado (4 ou 16 bytes) na chave de 16 bytes do índice."""
+    packed = bytes(packed)
+    return _IPV4_MAPPED + packed if len(packed) == 4 else packed
+
+
+def _parse_address(value):
+    value = value.strip()
+    # Arquivos do tipo IP2Location trazem o IP como inteiro decimal.
+    address = ipaddress.ip_address(int(value) if value.isdigit() else value)
+    return _key(address.packed)
+
+
+def _parse_row(row):
+    """(início, fim, país) de uma linha "início,fim,país[,...]" ou "rede/cidr,país[,...]"."""
+    if len(row) >= 3 and "/" not in row[0]:
+        start, end, country = _parse_address(row[0]), _parse_address(row[1]), row[2]
+    else:
+        network = ipaddress.ip_network(row[0].strip(), strict=False)
+        start = _key(network.network_address.packed)
+        end = _key(network.broadcast_address.packed)
+        country = row[1]
+    country = country.strip().upper()
+    if len(country) != 2 or not country.isalpha():
+        return None
+    return start, end, country.encode("ascii")
+
+
+def compile_geoip_database(csv_path, output_path):
+    """Gera o arquivo binário a partir do CSV e devolve o número de faixas."""
+    ranges = []
+    with open(csv_path, newline="", encoding="utf-8") as source:
+        for row in csv.reader(source):
+            if len(row) < 2:
+                continue
+            try:
+                parsed = _parse_row(row)
+            except ValueError:
+                # Cabeçalho ou linha malformada.
+                continue
+            if parsed:
+                ranges.append(parsed)
+    ranges.sort()
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(MAGIC)
+        for start, end, country in ranges:
+            out.write(start + end + country)
+    # Troca atômica: workers com o arquivo antigo aberto continuam lendo o mmap dele.
+    os.replace(tmp_path, output_path)
+    return len(ranges)
+
+
+class _Starts(Sequence):
+    """Visão dos inícios de faixa do mmap como sequência ordenada, para o bisect."""
+
+    def __init__(self, buffer, count):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        offset = len(MAGIC) + index * RECORD_SIZE
+        return self._buffer[offset : offset + 16]
+
+
+class GeoIPIndex:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[: len(MAGIC)] != MAGIC:
+            self._buffer.close()
+            raise ValueError(f"{path} não é um arquivo gerado pelo compile_geoip.")
+        self._count = (len(self._buffer) - len(MAGIC)) // RECORD_SIZE
+        self._starts = _Starts(self._buffer, self._count)
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, packed):
+        """Código ISO do país do IP compactado, ou "" se nenhuma faixa o contém."""
+        key = _key(packed)
+        index = bisect_right(self._starts, key) - 1
+        if index < 0:
+            return ""
+        offset = len(MAGIC) + index * RECORD_SIZE
+        if key > self._buffer[offset + 16 : offset + 32]:
+            return ""
+        return self._buffer[offset + 32 : offset + 34].decode("ascii")
+
+
+@lru_cache(maxsize=4)
+def _open_index(path):
+    # Arquivo ausente, ilegível, vazio ou de outro formato: o redirecionamento
+    # segue sem país. O lru_cache guarda o None, então o aviso sai uma vez.
+    try:
+        return GeoIPIndex(path)
+    except (OSError, ValueError):
+        logger.warning("GEOIP_DATABASE %s indisponivel; paises ficam vazios", path, exc_info=True)
+        return None
+
+
+def get_geoip_index():
+    """
+    Índice do GEOIP_DATABASE, ou None se não configurado/ausente/inválido. Aberto uma vez
+    por processo: depois de um compile_geoip novo, reinicie os workers.
+    """
+    path = settings.GEOIP_DATABASE
+    return _open_index(path) if path else None
+
+
+def lookup_country(packed):
+    index = get_geoip_index()
+    return index.lookup(packed) if index is not None else ""
@@ -0,0 +1,71 @@
+"""
+Internação de strings repetidas dos cliques (user agent, referer).
+
+Cada string distinta vira uma linha numa tabela de dicionário com chave de
+hash única; o clique guarda só o id. Um LRU em processo evita ir ao banco
+para as strings quentes. Só entram no LRU ids de linhas já confirmadas
+(transaction.on_commit), para nunca apontar para uma linha desfeita por rollback.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+
+def string_hash(value):
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+class InternCache:
+    """LRU hash -> id, seguro para threads."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            pk = self._entries.get(key)
+            if pk is not None:
+                self._entries.move_to_end(key)
+            return pk
+
+    def put(self, key, pk):
+        with self._lock:
+            self._entries[key] = pk
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_caches = {}
+
+
+def get_intern_cache(model):
+    cache = _caches.get(model._meta.label)
+    if cache is None:
+        cache = _caches.setdefault(model._meta.label, InternCache(settings.INTERN_CACHE_SIZE))
+    return cache
+
+
+def intern_string(model, value):
+    """Retorna o id de value na tabela model, criando a linha se preciso (None para vazio)."""
+    if not value:
+        return None
+
+    key = string_hash(value)
+    cache = get_intern_cache(model)
+    pk = cache.get(key)
+    if pk is None:
+        defaults = {"value": value, **model.derived_fields(value)}
+        pk = model.objects.get_or_create(hash=key, defaults=defaults)[0].pk
+        transaction.on_commit(lambda: cache.put(key, pk))
+    return pk
@@ -0,0 +1,248 @@
+"""
+Tabela de links em memória para o redirecionamento (LINK_TABLE_ENABLED).
+
+Guarda os links sem teto de cliques (max_clicks = 0) em colunas compactas, no
+mesmo espírito do shortener.geoip: códigos de largura fixa num único bytes
+ordenado (busca por bisect), URLs concatenadas num blob com offsets e os
+demais campos em array. São poucos objetos Python grandes e imutáveis, em vez
+de um dict e uma tupla por link: cerca de 40 bytes por link além da URL, e
+uma tabela carregada antes do fork (gunicorn --preload) fica compartilhada
+entre os workers por copy-on-write.
+
+Alterações entram num dicionário pequeno de deltas, lido do registro de
+alterações (LinkChange, por seq) a cada LINK_TABLE_REFRESH_INTERVAL segundos;
+a cada LINK_TABLE_FULL_REFRESH segundos (ou com deltas demais) a tabela é
+reconstruída. Links com teto ficam fora: unique_clicks muda a cada clique e o
+bloqueio precisa do valor atual, então eles seguem pelo cache (shortener.cache).
+
+Consistência: uma alteração (inclusive exclusão) leva até
+LINK_TABLE_REFRESH_INTERVAL segundos para valer.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+
+# max_length de ShortenedURL.short_code.
+CODE_WIDTH = 10
+FLAG_ACTIVE = 1
+LOAD_CHUNK_SIZE = 10000
+
+TABLE_FIELDS = (
+    "id",
+    "short_code",
+    "original_url",
+    "is_active",
+    "expires_at",
+    "max_clicks",
+    "click_sample_rate",
+)
+
+_table = None
+_last_refresh = 0.0
+_lock = threading.Lock()
+
+
+def _pad(short_code):
+    """Código na chave de largura fixa, ou None se não couber."""
+    key = short_code.encode("utf-8")
+    if len(key) > CODE_WIDTH:
+        return None
+    return key.ljust(CODE_WIDTH, b"\0")
+
+
+def _entry(pk, short_code, original_url, is_active, expires_at, click_sample_rate):
+    """Mesmo formato das entradas de shortener.cache (REDIRECT_FIELDS)."""
+    from .models import ShortenedURL
+
+    return {
+        "id": pk,
+        "short_code": short_code,
+        "original_url": original_url,
+        "is_active": is_active,
+        "expires_at": expires_at,
+        "max_clicks": 0,
+        "unique_clicks": 0,
+        "click_sample_rate": click_sample_rate,
+        "state": ShortenedURL.State.ACTIVE if is_active else ShortenedURL.State.INACTIVE,
+    }
+
+
+def _row_entry(row):
+    pk, short_code, original_url, is_active, expires_at, max_clicks, sample_rate = row
+    if max_clicks:
+        return None
+    return _entry(pk, short_code, original_url, is_active, expires_at, sample_rate)
+
+
+class _Codes(Sequence):
+    """Visão dos códigos ordenados como sequência, para o bisect."""
+
+    def __init__(self, buffer, count):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return self._buffer[index * CODE_WIDTH : (index + 1) * CODE_WIDTH]
+
+
+class LinkTable:
+    def __init__(self, rows, cursor):
+        """`rows` no formato de TABLE_FIELDS, só de links sem teto."""
+        keyed = sorted(
+            (key, row) for row in rows if (key := _pad(row[1])) is not None and not row[5]
+        )
+        codes = bytearray()
+        urls = bytearray()
+        self._ids = array("q")
+        self._offsets = array("Q", [0])
+        self._expires = array("d")
+        self._sample_rates = array("I")
+        flags = bytearray()
+        for key, (pk, _code, original_url, is_active, expires_at, _max, sample_rate) in keyed:
+            codes += key
+            urls += original_url.encode("utf-8")
+            self._ids.append(pk)
+            self._offsets.append(len(urls))
+            # 0.0 = sem expiração.
+            self._expires.append(expires_at.timestamp() if expires_at else 0.0)
+            self._sample_rates.append(sample_rate)
+            flags.append(FLAG_ACTIVE if is_active else 0)
+
+        self._count = len(self._ids)
+        self._codes = bytes(codes)
+        self._urls = bytes(urls)
+        self._flags = bytes(flags)
+        self._keys = _Codes(self._codes, self._count)
+        # short_code -> entrada (ou None: link apagado ou que passou a ter teto).
+        self._delta = {}
+        # Último seq de LinkChange já refletido na tabela.
+        self.cursor = cursor
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def delta_size(self):
+        return len(self._delta)
+
+    def nbytes(self):
+        """Memória aproximada das colunas, em bytes."""
+        columns = (self._ids, self._offsets, self._expires, self._sample_rates)
+        arrays = sum(column.itemsize * len(column) for column in columns)
+        return len(self._codes) + len(self._urls) + len(self._flags) + arrays
+
+    def get(self, short_code):
+        """Entrada de redirecionamento do link, ou None se a tabela não o serve."""
+        if short_code in self._delta:
+            return self._delta[short_code]
+        key = _pad(short_code)
+        if key is None:
+            return None
+        index = bisect_left(self._keys, key)
+        if index == self._count or self._keys[index] != key:
+            return None
+        expires = self._expires[index]
+        return _entry(
+            self._ids[index],
+            short_code,
+            self._urls[self._offsets[index] : self._offsets[index + 1]].decode("utf-8"),
+            bool(self._flags[index] & FLAG_ACTIVE),
+            datetime.fromtimestamp(expires, tz=dt_timezone.utc) if expires else None,
+            self._sample_rates[index],
+        )
+
+    def apply(self, short_codes, rows, cursor):
+        """Troca as entradas de `short_codes` pelas linhas atuais (sem linha: apagado)."""
+        for short_code in short_codes:
+            self._delta[short_code] = None
+        for row in rows:
+            self._delta[row[1]] = _row_entry(row)
+        self.cursor = cursor
+
+
+def get_link_table():
+    """Tabela do processo, ou None se ainda não carregada."""
+    return _table
+
+
+def load_link_table():
+    """Reconstrói a tabela do processo a partir do banco e a devolve."""
+    global _table, _last_refresh
+    from .changes import current_link_change_cursor
+    from .models import ShortenedURL
+
+    cursor = current_link_change_cursor()
+    rows = (
+        ShortenedURL.objects.filter(max_clicks=0)
+        .order_by()
+        .values_list(*TABLE_FIELDS)
+        .iterator(chunk_size=LOAD_CHUNK_SIZE)
+    )
+    _table = LinkTable(rows, cursor)
+    _last_refresh = time.monotonic()
+    return _table
+
+
+def refresh_link_table():
+    """Aplica as alterações desde o último seq lido (ou reconstrói, se for a hora)."""
+    global _last_refresh
+    from .changes import poll_link_changes
+    from .models import ShortenedURL
+
+    table = _table
+    if (
+        table is None
+        or time.monotonic() - table.loaded_at >= settings.LINK_TABLE_FULL_REFRESH
+        or table.delta_size > settings.LINK_TABLE_MAX_DELTA
+    ):
+        return load_link_table()
+    changes, cursor = poll_link_changes(table.cursor)
+    short_codes = {change["short_code"] for change in changes}
+    rows = []
+    if short_codes:
+        rows = (
+            ShortenedURL.objects.filter(short_code__in=short_codes)
+            .order_by()
+            .values_list(*TABLE_FIELDS)
+        )
+    table.apply(short_codes, rows, cursor)
+    _last_refresh = time.monotonic()
+    return table
+
+
+def get_link_entry(short_code):
+    """
+    Entrada de redirecionamento vinda da tabela, ou None (desligada, link com
+    teto ou desconhecido): nesse caso o chamador usa get_redirect_entry().
+    """
+    global _last_refresh
+    if not settings.LINK_TABLE_ENABLED:
+        return None
+    table = _table
+    if table is None or time.monotonic() - _last_refresh >= settings.LINK_TABLE_REFRESH_INTERVAL:
+        # Só uma thread atualiza; as demais seguem com a tabela atual.
+        if _lock.acquire(blocking=table is None):
+            try:
+                # Outra thread pode ter atualizado enquanto esta esperava o lock.
+                stale = time.monotonic() - _last_refresh >= settings.LINK_TABLE_REFRESH_INTERVAL
+                if _table is None or stale:
+                    refresh_link_table()
+            except DatabaseError:
+                # Banco indisponível: continua servindo a tabela que já existe.
+                _last_refresh = time.monotonic()
+            finally:
+                _lock.release()
+        table = _table
+    return table.get(short_code) if table is not None else None
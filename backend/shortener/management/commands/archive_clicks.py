@@ -0,0 +1,48 @@
+"""
+Comando que move cliques antigos da tabela Click para o arquivo compactado.
+
+Uso:
+    python manage.py archive_clicks --days 180
+    python manage.py archive_clicks --before 2025-01-01
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shortener.archive import archive_clicks, archive_root
+
+
+class Command(BaseCommand):
+    help = "Arquiva (NDJSON + gzip, por dia e URL) os cliques anteriores ao corte."
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--days", type=int, help="Arquiva cliques com mais de N dias.")
+        group.add_argument("--before", help="Arquiva cliques anteriores a esta data (AAAA-MM-DD).")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Cliques lidos e apagados por lote."
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["days"])
+        else:
+            try:
+                day = datetime.strptime(options["before"], "%Y-%m-%d").date()
+            except ValueError as exc:
+                raise CommandError("Use --before no formato AAAA-MM-DD.") from exc
+            cutoff = timezone.make_aware(datetime.combine(day, time.min))
+
+        archived = archive_clicks(
+            cutoff,
+            batch_size=options["batch_size"],
+            progress=lambda total: self.stdout.write(f"{total} clique(s) arquivado(s)..."),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{archived} clique(s) anteriores a {cutoff:%d/%m/%Y %H:%M} "
+                f"arquivado(s) em {archive_root()}."
+            )
+        )
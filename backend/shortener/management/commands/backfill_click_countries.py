@@ -0,0 +1,57 @@
+"""
+Comando que preenche o país dos cliques gravados sem base GeoIP.
+
+Uso:
+    python manage.py backfill_click_countries
+    python manage.py backfill_click_countries --all --batch-size 10000
+"""
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.geoip import get_geoip_index
+from shortener.models import Click
+
+
+class Command(BaseCommand):
+    help = "Preenche Click.country pela base GEOIP_DATABASE, em lotes por id."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recalcula todos os cliques, não só os sem país (após trocar a base).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Cliques lidos por lote.")
+
+    def handle(self, *args, **options):
+        index = get_geoip_index()
+        if index is None:
+            raise CommandError("GEOIP_DATABASE não configurado, ausente ou inválido.")
+
+        clicks = Click.objects.order_by("pk")
+        if not options["all"]:
+            clicks = clicks.filter(country="")
+
+        last_pk = 0
+        updated = 0
+        while True:
+            rows = list(
+                clicks.filter(pk__gt=last_pk).values_list("pk", "ip")[: options["batch_size"]]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            # Um UPDATE por país do lote, em vez de um por clique.
+            by_country = defaultdict(list)
+            for pk, ip in rows:
+                country = index.lookup(ip)
+                if country or options["all"]:
+                    by_country[country].append(pk)
+            for country, pks in by_country.items():
+                updated += Click.objects.filter(pk__in=pks).update(country=country)
+            self.stdout.write(f"{updated} clique(s) atualizado(s)...")
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} clique(s) com país preenchido."))
@@ -0,0 +1,361 @@
+"""
+Benchmark de latência e vazão dos endpoints principais.
+
+Popula N links e M cliques (com um prefixo de código ainda sem uso no banco;
+ao final são apagados só os links que o próprio benchmark criou), dispara
+requisições pelo cliente de teste do Django com C threads concorrentes contra o
+banco configurado (PostgreSQL ou SQLite) e imprime um JSON com p50/p95/p99,
+vazão e consultas SQL por requisição de cada endpoint.
+
+Uso:
+    python manage.py benchmark
+    python manage.py benchmark --links 1000 --clicks 100000 --requests 2000 \\
+        --concurrency 8 --endpoints redirect,statistics --output bench.json
+
+Para comparar commits, grave um JSON por execução (--label ajuda a identificá-los).
+Com SQLite, concorrência acima de 1 nos endpoints que escrevem (redirect,
+create) mede principalmente a espera pelo lock do arquivo.
+
+--importtime mede também a inicialização de um processo novo (django.setup()
+e carga das URLs/views, como num worker do gunicorn) com python -X importtime:
+tempo total, módulos mais caros, pico de memória (RSS) e quais dependências
+pesadas (HEAVY_MODULES) foram carregadas sem necessidade.
+"""
+
+import json
+import math
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from shortener.bulk import delete_links
+from shortener.models import Click, ShortenedURL
+from shortener.utils import ip_prefix, pack_ip
+
+ENDPOINTS = ("redirect", "list", "detail", "statistics", "create")
+SEED_BATCH_SIZE = 1000
+# Tentativas de sortear um prefixo de código que nenhum link use ainda.
+PREFIX_ATTEMPTS = 20
+# Poucos IPs por link: mistura visitantes únicos e repetidos no redirect.
+IP_POOL_SIZE = 256
+# Bibliotecas que só a geração de QR Code usa: não devem ser carregadas na subida.
+HEAVY_MODULES = ("PIL", "qrcode")
+IMPORTTIME_TOP = 15
+
+# Executado num processo novo: sobe o Django, carrega as URLs (e com elas as
+# views) e informa o pico de memória e os módulos pesados carregados.
+STARTUP_SCRIPT = f"""
+import json, resource, sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+heavy = sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules)
+print(json.dumps({{"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "heavy_modules": heavy}}))
+"""
+
+
+def _base36(number, width):
+    digits = string.digits + string.ascii_lowercase
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+    return encoded.rjust(width, "0")
+
+
+def _parse_importtime(stderr):
+    """Total (ms) e módulos mais caros da saída de python -X importtime."""
+    modules = []
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative_us = int(cumulative_us)
+        # Sem indentação: importado diretamente pelo script, não por outro módulo.
+        if not name.startswith("  "):
+            total_us += cumulative_us
+        modules.append((cumulative_us, name.strip()))
+    modules.sort(reverse=True)
+    top = [{"module": name, "cumulative_ms": round(us / 1000, 3)} for us, name in modules]
+    return round(total_us / 1000, 3), top[:IMPORTTIME_TOP]
+
+
+def measure_startup():
+    """Mede a subida de um processo novo com as settings atuais."""
+    env = {**os.environ}
+    env.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise CommandError(f"Falha ao medir a inicialização:\n{result.stderr[-2000:]}")
+
+    import_ms, top_imports = _parse_importtime(result.stderr)
+    child = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "wall_ms": round(wall_ms, 3),
+        "import_ms": import_ms,
+        "max_rss_kb": child["max_rss_kb"],
+        "heavy_modules": child["heavy_modules"],
+        "top_imports": top_imports,
+    }
+
+
+def _percentile(ordered, percent):
+    """Percentil por posição mais próxima sobre uma lista já ordenada."""
+    if not ordered:
+        return None
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class Command(BaseCommand):
+    help = "Mede latência (p50/p95/p99), vazão e consultas por requisição dos endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--links", type=int, default=100, help="Links criados para o teste.")
+        parser.add_argument(
+            "--clicks", type=int, default=1000, help="Cliques pré-existentes distribuídos."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requisições medidas por endpoint."
+        )
+        parser.add_argument("--concurrency", type=int, default=1, help="Threads simultâneas.")
+        parser.add_argument("--warmup", type=int, default=10, help="Requisições não medidas.")
+        parser.add_argument(
+            "--endpoints",
+            default=",".join(ENDPOINTS),
+            help=f"Lista separada por vírgula entre: {', '.join(ENDPOINTS)}.",
+        )
+        parser.add_argument("--label", default="", help="Rótulo gravado no resultado.")
+        parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout).")
+        parser.add_argument(
+            "--keep", action="store_true", help="Não apaga os links e cliques criados."
+        )
+        parser.add_argument(
+            "--importtime",
+            action="store_true",
+            help="Mede também a inicialização de um processo novo (python -X importtime).",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Endpoint(s) desconhecido(s): {', '.join(sorted(unknown))}.")
+        if options["links"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--links e --concurrency devem ser maiores que zero.")
+
+        startup = measure_startup() if options["importtime"] else None
+
+        self.prefix = self._unused_prefix()
+        self.created = 0
+        # Códigos de todos os links criados pelo benchmark: só eles são apagados.
+        self.created_codes = []
+        self.created_lock = threading.Lock()
+
+        started_at = datetime.now(timezone.utc)
+        media_root = tempfile.mkdtemp(prefix="benchmark-media-")
+        try:
+            self.short_codes = self._seed(options["links"], options["clicks"])
+            # Sem limite de taxa (todas as requisições vêm do mesmo processo) e
+            # com os QR Codes do create em diretório temporário.
+            with override_settings(
+                RATE_LIMITS={},
+                MEDIA_ROOT=media_root,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                results = {
+                    name: self._run_endpoint(
+                        name, options["requests"], options["concurrency"], options["warmup"]
+                    )
+                    for name in endpoints
+                }
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+            if not options["keep"]:
+                self._cleanup()
+
+        report = {
+            "label": options["label"],
+            "started_at": started_at.isoformat(),
+            "database": connection.vendor,
+            "config": {
+                "links": options["links"],
+                "clicks": options["clicks"],
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "warmup": options["warmup"],
+            },
+            "endpoints": results,
+        }
+        if startup is not None:
+            report["startup"] = startup
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+            self.stderr.write(f"Resultado gravado em {options['output']}.")
+        else:
+            self.stdout.write(output)
+
+    def _unused_prefix(self):
+        """Prefixo de 4 caracteres que nenhum link existente usa."""
+        alphabet = string.ascii_lowercase + string.digits
+        for _ in range(PREFIX_ATTEMPTS):
+            prefix = "zb" + "".join(random.choices(alphabet, k=2))
+            if not ShortenedURL.objects.filter(short_code__startswith=prefix).exists():
+                return prefix
+        raise CommandError(
+            "Nenhum prefixo livre para os links do benchmark: todos os sorteados já estão "
+            "em uso no banco. Rode contra um banco de teste."
+        )
+
+    def _cleanup(self):
+        for start in range(0, len(self.created_codes), SEED_BATCH_SIZE):
+            codes = self.created_codes[start : start + SEED_BATCH_SIZE]
+            delete_links(ShortenedURL.objects.filter(short_code__in=codes))
+
+    def _seed(self, links, clicks):
+        short_codes = [f"{self.prefix}{_base36(index, 5)}" for index in range(links)]
+        url_ids = []
+        for start in range(0, links, SEED_BATCH_SIZE):
+            codes = short_codes[start : start + SEED_BATCH_SIZE]
+            ShortenedURL.objects.bulk_create(
+                ShortenedURL(original_url=f"https://example.com/bench/{code}", short_code=code)
+                for code in codes
+            )
+            self.created_codes.extend(codes)
+            url_ids.extend(
+                ShortenedURL.objects.filter(short_code__in=codes)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+
+        ips = {}
+        for start in range(0, clicks, SEED_BATCH_SIZE):
+            batch = []
+            for index in range(start, min(start + SEED_BATCH_SIZE, clicks)):
+                url_id = url_ids[index % len(url_ids)]
+                packed = pack_ip(f"10.{index % IP_POOL_SIZE}.0.1")
+                ips.setdefault(url_id, []).append(packed)
+                batch.append(Click(url_id=url_id, ip=packed, ip_prefix=ip_prefix(packed)))
+            Click.objects.bulk_create(batch)
+
+        # Contadores coerentes com os cliques semeados.
+        for url_id, packed_ips in ips.items():
+            ShortenedURL.objects.filter(pk=url_id).update(
+                total_clicks=len(packed_ips), unique_clicks=len(set(packed_ips))
+            )
+        return short_codes
+
+    def _request(self, client, name):
+        code = random.choice(self.short_codes)
+        if name == "redirect":
+            address = f"10.{random.randrange(IP_POOL_SIZE)}.0.1"
+            return client.get(f"/api/r/{code}/", REMOTE_ADDR=address), 302
+        if name == "list":
+            return client.get("/api/urls/"), 200
+        if name == "detail":
+            return client.get(f"/api/urls/{code}/"), 200
+        if name == "statistics":
+            return client.get(f"/api/urls/{code}/statistics/"), 200
+        with self.created_lock:
+            self.created += 1
+            new_code = f"{self.prefix}c{_base36(self.created, 4)}"
+        response = client.post(
+            "/api/urls/",
+            {"original_url": f"https://example.com/bench/{new_code}", "short_code": new_code},
+            content_type="application/json",
+        )
+        if response.status_code == 201:
+            with self.created_lock:
+                self.created_codes.append(new_code)
+        return response, 201
+
+    def _worker(self, name, quantity, samples, close_connection):
+        client = Client(raise_request_exception=False)
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(count_queries):
+                for _ in range(quantity):
+                    before = queries[0]
+                    start = time.perf_counter()
+                    try:
+                        response, expected = self._request(client, name)
+                        ok = response.status_code == expected
+                    except Exception:
+                        ok = False
+                    elapsed = time.perf_counter() - start
+                    samples.append((elapsed, queries[0] - before, ok))
+        finally:
+            if close_connection:
+                connection.close()
+
+    def _run_endpoint(self, name, requests, concurrency, warmup):
+        self._worker(name, warmup, [], close_connection=False)
+
+        samples = []
+        start = time.perf_counter()
+        if concurrency == 1:
+            self._worker(name, requests, samples, close_connection=False)
+        else:
+            shares = [
+                requests // concurrency + (i < requests % concurrency) for i in range(concurrency)
+            ]
+            threads = [
+                threading.Thread(target=self._worker, args=(name, share, samples, True))
+                for share in shares
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        wall_time = time.perf_counter() - start
+
+        latencies = sorted(elapsed * 1000 for elapsed, _queries, _ok in samples)
+        total_queries = sum(queries for _elapsed, queries, _ok in samples)
+        errors = sum(1 for _elapsed, _queries, ok in samples if not ok)
+
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "wall_time_s": rounded(wall_time),
+            "throughput_rps": rounded(len(samples) / wall_time) if wall_time else None,
+            "mean_ms": rounded(sum(latencies) / len(latencies)) if latencies else None,
+            "p50_ms": rounded(_percentile(latencies, 50)),
+            "p95_ms": rounded(_percentile(latencies, 95)),
+            "p99_ms": rounded(_percentile(latencies, 99)),
+            "max_ms": rounded(latencies[-1]) if latencies else None,
+            "queries_per_request": rounded(total_queries / len(samples)) if samples else None,
+        }
@@ -0,0 +1,65 @@
+"""
+Comando para operações em massa sobre a tabela de links, em lotes.
+
+Uso:
+    python manage.py bulk_links delete --expired
+    python manage.py bulk_links deactivate --state exhausted --batch-size 5000
+    python manage.py bulk_links activate --all
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shortener.bulk import delete_links, set_links_active
+from shortener.models import ShortenedURL
+
+
+class Command(BaseCommand):
+    help = "Ativa, desativa ou apaga (com os cliques) links em lotes de tamanho limitado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("operation", choices=["activate", "deactivate", "delete"])
+        parser.add_argument(
+            "--expired", action="store_true", help="Somente links com expires_at no passado."
+        )
+        parser.add_argument(
+            "--state", choices=ShortenedURL.State.values, help="Somente links neste estado."
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Todos os links (exigido quando não há filtro)."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Links processados por lote."
+        )
+
+    def handle(self, *args, **options):
+        queryset = ShortenedURL.objects.all()
+        if options["expired"]:
+            queryset = queryset.filter(expires_at__lt=timezone.now())
+        if options["state"]:
+            queryset = queryset.filter(state=options["state"])
+        if not (options["expired"] or options["state"] or options["all"]):
+            raise CommandError("Informe --expired, --state ou --all.")
+
+        operation = options["operation"]
+        if operation == "delete":
+            links, clicks = delete_links(
+                queryset,
+                batch_size=options["batch_size"],
+                progress=lambda links, clicks: self.stdout.write(
+                    f"{links} link(s) e {clicks} clique(s) apagado(s)..."
+                ),
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"{links} link(s) e {clicks} clique(s) apagado(s).")
+            )
+            return
+
+        updated = set_links_active(
+            queryset,
+            operation == "activate",
+            batch_size=options["batch_size"],
+            progress=lambda total: self.stdout.write(f"{total} link(s) atualizado(s)..."),
+        )
+        verb = "ativado(s)" if operation == "activate" else "desativado(s)"
+        self.stdout.write(self.style.SUCCESS(f"{updated} link(s) {verb}."))
@@ -0,0 +1,37 @@
+"""
+Comando que gera a base IP -> país usada no enriquecimento dos cliques.
+
+Uso:
+    python manage.py compile_geoip faixas.csv
+    python manage.py compile_geoip faixas.csv --output /srv/geoip.bin
+
+O CSV pode ter linhas "início,fim,país" (IPs textuais ou inteiros, como no
+IP2Location) ou "rede/cidr,país". Depois de gerar, reinicie os workers.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener.geoip import compile_geoip_database
+
+
+class Command(BaseCommand):
+    help = "Compila um CSV de faixas de IP por país no arquivo lido pelo GEOIP_DATABASE."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="CSV de faixas de IP com o código ISO do país.")
+        parser.add_argument(
+            "--output", help="Arquivo gerado (padrão: o caminho de GEOIP_DATABASE)."
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"] or settings.GEOIP_DATABASE
+        if not output:
+            raise CommandError("Informe --output ou configure GEOIP_DATABASE.")
+
+        try:
+            count = compile_geoip_database(options["csv_path"], output)
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(self.style.SUCCESS(f"{count} faixa(s) gravada(s) em {output}."))
@@ -0,0 +1,46 @@
+"""
+Comando que atualiza o estado denormalizado dos links (expirado/esgotado) e
+apaga do registro de alterações o que passou de LINK_CHANGE_RETENTION_DAYS.
+
+Uso:
+    python manage.py sweep_links               # uma varredura
+    python manage.py sweep_links --interval 60 # agendador em processo, a cada 60s
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from shortener.changes import prune_link_changes
+from shortener.sweeper import sweep_link_states
+
+
+class Command(BaseCommand):
+    help = "Move links vencidos ou que atingiram o teto de cliques para o estado correspondente."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repete a varredura a cada N segundos (0 = executa uma vez).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Quantidade de links atualizados por UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            moved = sweep_link_states(batch_size=options["batch_size"])
+            self.stdout.write(
+                f"{moved['expired']} link(s) expirado(s), {moved['exhausted']} esgotado(s)."
+            )
+            pruned = prune_link_changes()
+            if pruned:
+                self.stdout.write(f"{pruned} alteração(ões) antiga(s) removida(s) do registro.")
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,271 @@
+"""
+Métricas em processo no formato de texto do Prometheus, servidas em /metrics.
+
+Contadores e histogramas ficam em dicionários do próprio processo (um lock,
+nenhuma E/S no caminho da requisição). Com vários workers do gunicorn, defina
+METRICS_DIR: uma thread de fundo de cada processo grava seu retrato em
+<METRICS_DIR>/metrics-<pid>.json a cada METRICS_FLUSH_INTERVAL segundos (e na
+saída do processo), e /metrics soma os arquivos de todos. Falha ao gravar vai
+para o log, nunca para a requisição. Quando um worker morre, o hook child_exit
+do gunicorn.conf.py apaga o arquivo dele (remove_process_file): a soma cai, o
+que o Prometheus trata como reinício do contador. Ao reiniciar o serviço
+inteiro, limpe o diretório.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_registry = {}
+# Thread que grava o retrato do processo em METRICS_DIR (uma por processo).
+_flusher = None
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _ensure_flusher()
+
+    def value(self, **labels):
+        return self.values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    @staticmethod
+    def merge(current, other):
+        return (current or 0) + other
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Por conjunto de labels: [contagens por faixa (+ a de +Inf), soma, total].
+        self.values = {}
+        _registry[name] = self
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+        _ensure_flusher()
+
+    @staticmethod
+    def merge(current, other):
+        if current is None:
+            return [list(other[0]), other[1], other[2]]
+        return [
+            [a + b for a, b in zip(current[0], other[0])],
+            current[1] + other[1],
+            current[2] + other[2],
+        ]
+
+
+REQUEST_SECONDS = Histogram(
+    "shortener_request_duration_seconds",
+    "Tempo de resposta por view (view=redirect e o redirecionamento).",
+    labelnames=("view",),
+)
+REQUEST_QUERIES = Histogram(
+    "shortener_request_db_queries",
+    "Consultas SQL por requisicao, por view.",
+    labelnames=("view",),
+    buckets=QUERY_BUCKETS,
+)
+REDIRECT_CACHE = Counter(
+    "shortener_redirect_cache_total",
+    "Consultas ao cache de redirecionamento, por resultado (hit/miss).",
+    labelnames=("result",),
+)
+BLOCKED_RESPONSES = Counter(
+    "shortener_blocked_responses_total",
+    "Respostas de bloqueio do redirecionamento, por tipo de BLOCKED_PAGES.",
+    labelnames=("kind",),
+)
+QR_RENDER_SECONDS = Histogram(
+    "shortener_qr_render_duration_seconds",
+    "Tempo para gerar o PNG do QR Code.",
+)
+
+
+def _reset_after_fork():
+    # O worker recém-criado não herda as contagens nem a thread do processo pai.
+    global _flusher
+    for metric in _registry.values():
+        metric.values = {}
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def snapshot():
+    """Valores do processo atual, serializáveis em JSON."""
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+        }
+
+
+def _process_file(directory, pid=None):
+    return os.path.join(directory, f"metrics-{pid or os.getpid()}.json")
+
+
+def flush():
+    """Grava o retrato do processo em METRICS_DIR. Retorna False se não conseguiu."""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return False
+    path = _process_file(directory)
+    try:
+        # Nome temporário único: a thread de fundo e um /metrics podem gravar juntos.
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=f"metrics-{os.getpid()}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(snapshot(), file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        logger.warning("Falha ao gravar as metricas em %s", directory, exc_info=True)
+        return False
+    return True
+
+
+def remove_process_file(pid):
+    """Apaga o retrato (e temporários) de um processo encerrado, se houver METRICS_DIR."""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    paths = [_process_file(directory, pid)]
+    paths += glob.glob(os.path.join(directory, f"metrics-{pid}.*.tmp"))
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None or not settings.METRICS_DIR:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _flusher.start()
+
+
+def _flush_at_exit():
+    # Só quem registrou métricas tem retrato: o mestre do gunicorn, que importa
+    # este módulo no child_exit, não deixa um arquivo que ninguém apagaria.
+    if _flusher is not None:
+        flush()
+
+
+# Grava o retrato final quando o worker sai normalmente.
+atexit.register(_flush_at_exit)
+
+
+def collect():
+    """Soma dos retratos de todos os processos (ou só do atual, sem METRICS_DIR)."""
+    directory = settings.METRICS_DIR
+    if not directory:
+        snapshots = [snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            # Arquivo removido ou sendo trocado neste instante: fica para a próxima coleta.
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+    merged = {name: {} for name in _registry}
+    for data in snapshots:
+        for name, rows in data.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            for key, value in rows:
+                key = tuple(key)
+                merged[name][key] = metric.merge(merged[name].get(key), value)
+    return merged
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render():
+    """Texto de exposição do Prometheus (versão 0.0.4)."""
+    lines = []
+    for name, values in collect().items():
+        metric = _registry[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip((*metric.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = (("le", str(bound)),)
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {total}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {count}")
+    return "\n".join(lines) + "\n"
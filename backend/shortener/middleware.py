@@ -0,0 +1,195 @@
+"""
+Middlewares do encurtador.
+
+MetricsMiddleware mede tempo de resposta e consultas SQL de cada requisição,
+por view, para o /metrics (shortener.metrics).
+
+ProfilingMiddleware perfila requisições escolhidas (cabeçalho, amostragem ou
+todas) e grava o resultado em PROFILING_DIR. Desligado (PROFILING_ENABLED=False)
+ele nem entra na cadeia de middlewares.
+
+DatabasePinMiddleware mantém no banco primário as leituras de requisições que
+escrevem e, por DATABASE_PIN_SECONDS, as do cliente que acabou de escrever
+(shortener.routers). Só é carregado com réplicas configuradas.
+"""
+
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+from . import metrics, routers
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "<unmatched>"
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view)
+        metrics.REQUEST_QUERIES.observe(queries, view=view)
+        return response
+
+
+class DatabasePinMiddleware:
+    cookie_name = "db_pin"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICA_URLS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in self.safe_methods
+        with routers.request_scope(pinned=writes or self.cookie_name in request.COOKIES):
+            response = self.get_response(request)
+        if writes and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class StackSampler(threading.Thread):
+    """
+    Amostra a pilha de uma thread a cada intervalo e acumula as pilhas no formato
+    "collapsed" (frame;frame;frame contagem), lido por flamegraph.pl e speedscope.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", code.co_filename)
+                names.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Perfila a requisição quando:
+        - traz o cabeçalho X-Profile com o valor de PROFILING_TOKEN; ou
+        - cai na amostragem PROFILING_SAMPLE_RATE (0.0 a 1.0).
+
+    Grava em PROFILING_DIR, com o id devolvido no cabeçalho X-Profile-Id:
+        <id>.collapsed (PROFILING_MODE="sampler") ou <id>.prof (="cprofile",
+        para pstats/snakeviz) e <id>.sql com as consultas e seus tempos.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def _should_profile(self, request):
+        token = settings.PROFILING_TOKEN
+        header = request.headers.get("X-Profile")
+        if token and header and constant_time_compare(header, token):
+            return True
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((time.perf_counter() - start, sql))
+
+        if settings.PROFILING_MODE == "cprofile":
+            profiler = cProfile.Profile()
+        else:
+            profiler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            if isinstance(profiler, StackSampler):
+                profiler.start()
+                stack.callback(profiler.stop)
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        elapsed = time.perf_counter() - start
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._write(profile_id, request, response, elapsed, profiler, queries)
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def _write(self, profile_id, request, response, elapsed, profiler, queries):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, profile_id)
+
+        if isinstance(profiler, StackSampler):
+            with open(f"{base}.collapsed", "w") as file:
+                file.write(profiler.collapsed())
+        else:
+            profiler.dump_stats(f"{base}.prof")
+
+        with open(f"{base}.sql", "w") as file:
+            file.write(
+                f"-- {request.method} {request.get_full_path()} -> {response.status_code} "
+                f"em {elapsed * 1000:.1f} ms, {len(queries)} consulta(s)\n"
+            )
+            for duration, sql in queries:
+                file.write(f"-- {duration * 1000:.2f} ms\n{sql};\n")
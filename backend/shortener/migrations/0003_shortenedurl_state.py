@@ -0,0 +1,52 @@
+# Generated by Django 6.0.8 on 2026-10-19 19:42
+
+from django.db import migrations, models
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+
+def populate_state(apps, schema_editor):
+    ShortenedURL = apps.get_model("shortener", "ShortenedURL")
+    ShortenedURL.objects.update(
+        state=Case(
+            When(is_active=False, then=Value("inactive")),
+            When(expires_at__lt=timezone.now(), then=Value("expired")),
+            When(
+                Q(max_clicks__gt=0) & Q(unique_clicks__gte=F("max_clicks")),
+                then=Value("exhausted"),
+            ),
+            default=Value("active"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shortener", "0002_alter_click_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shortenedurl",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("active", "Ativo"),
+                    ("expired", "Expirado"),
+                    ("exhausted", "Limite atingido"),
+                    ("inactive", "Inativo"),
+                ],
+                default="active",
+                editable=False,
+                help_text="Estado de acesso mantido pelo save() e pelo sweep_links",
+                max_length=10,
+                verbose_name="Estado",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shortenedurl",
+            index=models.Index(fields=["state", "expires_at"], name="shortener_s_state_f6f632_idx"),
+        ),
+        migrations.RunPython(populate_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.8 on 2026-10-19 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0003_shortenedurl_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="click",
+            name="client_class",
+            field=models.CharField(
+                choices=[("human", "Pessoa"), ("preview", "Previa de link"), ("bot", "Robo")],
+                default="human",
+                help_text="Classificacao do visitante pelo user agent",
+                max_length=10,
+                verbose_name="Origem",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shortenedurl",
+            name="bot_clicks",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Acessos de robos e previas de link (nao entram nos contadores)",
+                verbose_name="Cliques de Robos",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(
+                fields=["url", "client_class"], name="shortener_c_url_id_f99fb3_idx"
+            ),
+        ),
+    ]
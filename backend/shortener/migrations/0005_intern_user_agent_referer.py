@@ -0,0 +1,124 @@
+# Generated by Django 6.0.8 on 2026-10-19 20:31
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _string_hash(value):
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+def _intern_all(model, values):
+    """Interna um lote de strings e devolve {valor: id}."""
+    by_hash = {_string_hash(value): value for value in values if value}
+    model.objects.bulk_create(
+        [model(hash=key, value=value) for key, value in by_hash.items()],
+        ignore_conflicts=True,
+    )
+    ids = dict(model.objects.filter(hash__in=by_hash).values_list("hash", "pk"))
+    return {value: ids[key] for key, value in by_hash.items()}
+
+
+def backfill_interned_strings(apps, schema_editor):
+    Click = apps.get_model("shortener", "Click")
+    UserAgent = apps.get_model("shortener", "UserAgent")
+    Referer = apps.get_model("shortener", "Referer")
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Click.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "user_agent", "referer")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+
+        user_agents = _intern_all(UserAgent, {user_agent for _pk, user_agent, _ref in rows})
+        referers = _intern_all(Referer, {referer for _pk, _ua, referer in rows})
+        Click.objects.bulk_update(
+            [
+                Click(
+                    pk=pk,
+                    user_agent_ref_id=user_agents.get(user_agent),
+                    referer_ref_id=referers.get(referer),
+                )
+                for pk, user_agent, referer in rows
+            ],
+            ["user_agent_ref", "referer_ref"],
+        )
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0004_click_client_class"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Referer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("hash", models.CharField(editable=False, max_length=32, unique=True)),
+                ("value", models.TextField(editable=False)),
+            ],
+            options={
+                "verbose_name": "Referencia",
+                "verbose_name_plural": "Referencias",
+            },
+        ),
+        migrations.CreateModel(
+            name="UserAgent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("hash", models.CharField(editable=False, max_length=32, unique=True)),
+                ("value", models.TextField(editable=False)),
+            ],
+            options={
+                "verbose_name": "User Agent",
+                "verbose_name_plural": "User Agents",
+            },
+        ),
+        migrations.AddField(
+            model_name="click",
+            name="referer_ref",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="URL de onde veio o clique",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="shortener.referer",
+                verbose_name="Referencia",
+            ),
+        ),
+        migrations.AddField(
+            model_name="click",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Navegador e sistema operacional",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="shortener.useragent",
+                verbose_name="User Agent",
+            ),
+        ),
+        migrations.RunPython(backfill_interned_strings, migrations.RunPython.noop),
+    ]
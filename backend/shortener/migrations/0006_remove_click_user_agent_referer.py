@@ -0,0 +1,22 @@
+# Generated by Django 6.0.8 on 2026-10-19 20:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separada da 0005: no PostgreSQL o ALTER TABLE nao pode rodar na mesma
+    # transacao que acabou de atualizar as FKs da tabela (eventos de trigger pendentes).
+    dependencies = [
+        ("shortener", "0005_intern_user_agent_referer"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="click",
+            name="referer",
+        ),
+        migrations.RemoveField(
+            model_name="click",
+            name="user_agent",
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.8 on 2026-10-19 21:02
+
+import ipaddress
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _pack(ip):
+    address = ipaddress.ip_address(ip)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.packed
+
+
+def backfill_packed_ip(apps, schema_editor):
+    Click = apps.get_model("shortener", "Click")
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Click.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "ip_address")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+
+        updates = []
+        for pk, ip_address in rows:
+            packed = _pack(ip_address)
+            prefix = packed[:3] if len(packed) == 4 else packed[:6]
+            updates.append(Click(pk=pk, ip=packed, ip_prefix=prefix))
+        Click.objects.bulk_update(updates, ["ip", "ip_prefix"])
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0006_remove_click_user_agent_referer"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="click",
+            name="ip",
+            field=models.BinaryField(
+                help_text="IP do usuario que clicou",
+                max_length=16,
+                null=True,
+                verbose_name="Endereco IP",
+            ),
+        ),
+        migrations.AddField(
+            model_name="click",
+            name="ip_prefix",
+            field=models.BinaryField(
+                help_text="Prefixo /24 (IPv4) ou /48 (IPv6) do IP, para agregacao",
+                max_length=6,
+                null=True,
+                verbose_name="Rede do IP",
+            ),
+        ),
+        migrations.RunPython(backfill_packed_ip, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.8 on 2026-10-19 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separada da 0007 pelo mesmo motivo da 0006: ALTER TABLE depois do backfill.
+    dependencies = [
+        ("shortener", "0007_click_compact_ip"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="click",
+            name="shortener_c_url_id_f84180_idx",
+        ),
+        migrations.RemoveField(
+            model_name="click",
+            name="ip_address",
+        ),
+        migrations.AlterField(
+            model_name="click",
+            name="ip",
+            field=models.BinaryField(
+                help_text="IP do usuario que clicou", max_length=16, verbose_name="Endereco IP"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="click",
+            name="ip_prefix",
+            field=models.BinaryField(
+                help_text="Prefixo /24 (IPv4) ou /48 (IPv6) do IP, para agregacao",
+                max_length=6,
+                verbose_name="Rede do IP",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(fields=["url", "ip"], name="shortener_c_url_id_d9c82a_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(fields=["url", "ip_prefix"], name="shortener_c_url_id_5357e6_idx"),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.8 on 2026-10-19 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0008_remove_click_ip_address"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="click",
+            name="weight",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Quantos cliques esta linha representa (amostragem 1 a cada N)",
+                verbose_name="Peso",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shortenedurl",
+            name="click_sample_rate",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Grava 1 a cada N cliques repetidos (0 usa o padrao global)",
+                verbose_name="Amostragem de Cliques",
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.8 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _backfill(model, field, derive):
+    last_pk = 0
+    while True:
+        rows = list(model.objects.filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+        if not rows:
+            break
+        for row in rows:
+            setattr(row, field, derive(row.value))
+        model.objects.bulk_update(rows, [field])
+        last_pk = rows[-1].pk
+
+
+def backfill_family_domain(apps, schema_editor):
+    # Funções puras, sem acesso ao banco: seguro usar a versão atual do app.
+    from shortener.useragents import user_agent_family
+    from shortener.utils import referer_domain
+
+    _backfill(apps.get_model("shortener", "UserAgent"), "family", user_agent_family)
+    _backfill(apps.get_model("shortener", "Referer"), "domain", referer_domain)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0009_click_sampling"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="referer",
+            name="domain",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Dominio da referencia, para agrupar nas analises",
+                max_length=255,
+                verbose_name="Dominio",
+            ),
+        ),
+        migrations.AddField(
+            model_name="useragent",
+            name="family",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Familia do navegador, para agrupar nas analises",
+                max_length=32,
+                verbose_name="Familia",
+            ),
+        ),
+        migrations.RunPython(backfill_family_domain, migrations.RunPython.noop),
+    ]
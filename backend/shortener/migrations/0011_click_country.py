@@ -0,0 +1,27 @@
+# Generated by Django 6.0.8 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0010_interned_family_domain"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="click",
+            name="country",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Codigo ISO do pais do IP (base GeoIP local)",
+                max_length=2,
+                verbose_name="Pais",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(fields=["url", "country"], name="shortener_c_url_id_f01cd2_idx"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.8 on 2026-10-19 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0011_click_country"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="shortenedurl",
+            index=models.Index(
+                fields=["state", "-total_clicks"], name="shortener_s_state_154832_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 6.0.8 on 2026-10-19 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0012_shortenedurl_state_total_clicks_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="shortenedurl",
+            index=models.Index(fields=["updated_at"], name="shortener_s_updated_7aea0d_idx"),
+        ),
+    ]
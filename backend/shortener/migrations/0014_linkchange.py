@@ -0,0 +1,60 @@
+# Generated by Django 6.0.8 on 2026-10-20 00:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0013_shortenedurl_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LinkChange",
+            fields=[
+                (
+                    "seq",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="Sequencia"
+                    ),
+                ),
+                (
+                    "short_code",
+                    models.CharField(
+                        help_text="Codigo do link alterado",
+                        max_length=10,
+                        verbose_name="Codigo Curto",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("upsert", "Criado/alterado"), ("delete", "Apagado")],
+                        default="upsert",
+                        help_text="Criado/alterado ou apagado",
+                        max_length=6,
+                        verbose_name="Tipo",
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=django.utils.timezone.now,
+                        help_text="Data da alteracao (usada na limpeza do registro)",
+                        verbose_name="Alterado em",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Alteracao de Link",
+                "verbose_name_plural": "Alteracoes de Links",
+                "ordering": ["seq"],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="shortenedurl",
+            name="shortener_s_updated_7aea0d_idx",
+        ),
+    ]
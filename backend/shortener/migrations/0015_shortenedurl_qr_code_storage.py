@@ -0,0 +1,25 @@
+# Generated by Django 6.0.8 on 2026-10-20 00:40
+
+import shortener.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shortener", "0014_linkchange"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="shortenedurl",
+            name="qr_code",
+            field=models.ImageField(
+                blank=True,
+                help_text="Imagem do QR Code gerado automaticamente",
+                null=True,
+                storage=shortener.storage.qr_code_storage,
+                upload_to="qrcodes/",
+                verbose_name="QR Code",
+            ),
+        ),
+    ]
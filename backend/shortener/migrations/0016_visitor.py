@@ -0,0 +1,83 @@
+# Generated by Django 6.0.8 on 2026-10-20 02:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def populate_visitors(apps, schema_editor):
+    """Um Visitor por (link, IP) dos cliques de pessoas ainda no banco."""
+    Click = apps.get_model("shortener", "Click")
+    Visitor = apps.get_model("shortener", "Visitor")
+    rows = (
+        Click.objects.filter(client_class="human")
+        .order_by()
+        .values("url_id", "ip")
+        .annotate(first_seen_at=Min("clicked_at"))
+        .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    )
+    batch = []
+    for row in rows:
+        batch.append(Visitor(**row))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            Visitor.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Visitor.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shortener", "0015_shortenedurl_qr_code_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Visitor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "ip",
+                    models.BinaryField(
+                        help_text="IP do visitante", max_length=16, verbose_name="Endereco IP"
+                    ),
+                ),
+                (
+                    "first_seen_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Data e hora do primeiro clique deste IP no link",
+                        verbose_name="Primeiro acesso",
+                    ),
+                ),
+                (
+                    "url",
+                    models.ForeignKey(
+                        help_text="URL encurtada visitada",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="visitors",
+                        to="shortener.shortenedurl",
+                        verbose_name="URL",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Visitante",
+                "verbose_name_plural": "Visitantes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("url", "ip"), name="shortener_visitor_url_ip_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_visitors, migrations.RunPython.noop),
+    ]
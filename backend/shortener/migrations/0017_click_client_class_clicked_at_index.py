@@ -0,0 +1,19 @@
+# Generated by Django 6.0.8 on 2026-10-20 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shortener", "0016_visitor"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(
+                fields=["client_class", "clicked_at"], name="shortener_c_client__d563d8_idx"
+            ),
+        ),
+    ]
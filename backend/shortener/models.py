@@ -4,9 +4,16 @@ Modelos para aplicação de encurtamento de URLs
 Este módulo define os modelos de banco de dados para URLs encurtadas e rastreamento de cliques.
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 
+from .cache import purge_redirect_cache
+from .geoip import lookup_country
+from .interning import intern_string
+from .storage import qr_code_storage
+from .utils import ip_prefix, pack_ip, referer_domain, unpack_ip
+
 
 class ShortenedURL(models.Model):
     """
@@ -20,11 +27,20 @@ class ShortenedURL(models.Model):
         max_clicks (int): Número máximo de cliques únicos permitidos (0 = ilimitado).
         total_clicks (int): Número total de cliques recebidos
         unique_clicks (int): Número de cliques únicos (com base no endereço IP).
-        qr_code (ImageField): Imagem do código QR gerada automaticamente.
+        bot_clicks (int): Acessos de robôs e pré-visualizações, fora dos contadores acima.
+        click_sample_rate (int): Grava 1 a cada N cliques repetidos (0 = CLICK_SAMPLE_RATE).
+        qr_code (ImageField): Imagem do código QR gerada automaticamente (nome = sha256).
+        state (str): Estado de acesso denormalizado (ativo, expirado, esgotado, inativo).
         created_at (datetime): Data e hora em que a URL foi criada.
         updated_at (datetime): Data e hora em que a URL foi atualizada pela última vez.
     """
 
+    class State(models.TextChoices):
+        ACTIVE = "active", "Ativo"
+        EXPIRED = "expired", "Expirado"
+        EXHAUSTED = "exhausted", "Limite atingido"
+        INACTIVE = "inactive", "Inativo"
+
     original_url = models.URLField(
         verbose_name="URL Original",
         max_length=2048,
@@ -68,14 +84,36 @@ class ShortenedURL(models.Model):
         help_text="Contador de cliques unicos (baseadoem IP)",
     )
 
+    bot_clicks = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Cliques de Robos",
+        help_text="Acessos de robos e previas de link (nao entram nos contadores)",
+    )
+
+    click_sample_rate = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Amostragem de Cliques",
+        help_text="Grava 1 a cada N cliques repetidos (0 usa o padrao global)",
+    )
+
     qr_code = models.ImageField(
         upload_to="qrcodes/",
+        storage=qr_code_storage,
         null=True,
         blank=True,
         verbose_name="QR Code",
         help_text="Imagem do QR Code gerado automaticamente",
     )
 
+    state = models.CharField(
+        max_length=10,
+        choices=State.choices,
+        default=State.ACTIVE,
+        editable=False,
+        verbose_name="Estado",
+        help_text="Estado de acesso mantido pelo save() e pelo sweep_links",
+    )
+
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Criado em", help_text="Data de criacao"
     )
@@ -92,11 +130,54 @@ class ShortenedURL(models.Model):
             models.Index(fields=["short_code"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["is_active"]),
+            models.Index(fields=["state", "expires_at"]),
+            # warm_redirect_cache(): ativos em ordem de cliques.
+            models.Index(fields=["state", "-total_clicks"]),
         ]
 
     def __str__(self):
         return f"{self.short_code} -> {self.original_url}"
 
+    def save(self, *args, **kwargs):
+        self.state = self.compute_state()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            # auto_now só é gravado se o campo estiver em update_fields.
+            kwargs["update_fields"] = {*update_fields, "state", "updated_at"}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            LinkChange.record(LinkChange.Kind.UPSERT, self.short_code)
+        purge_redirect_cache(self.short_code)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            LinkChange.record(LinkChange.Kind.DELETE, self.short_code)
+        purge_redirect_cache(self.short_code)
+        return result
+
+    @classmethod
+    def state_expression(cls, now=None):
+        """Mesma precedência de can_be_accessed(), avaliada no banco (para update())."""
+        return Case(
+            When(is_active=False, then=Value(cls.State.INACTIVE)),
+            When(expires_at__lt=now or timezone.now(), then=Value(cls.State.EXPIRED)),
+            When(
+                Q(max_clicks__gt=0) & Q(unique_clicks__gte=F("max_clicks")),
+                then=Value(cls.State.EXHAUSTED),
+            ),
+            default=Value(cls.State.ACTIVE),
+        )
+
+    def compute_state(self):
+        if not self.is_active:
+            return self.State.INACTIVE
+        if self.is_expired():
+            return self.State.EXPIRED
+        if self.has_reached_max_clicks():
+            return self.State.EXHAUSTED
+        return self.State.ACTIVE
+
     def is_expired(self):
         if self.expires_at and timezone.now() > self.expires_at:
             return True
@@ -116,6 +197,34 @@ class ShortenedURL(models.Model):
             return False, "Limite de cliques atingido"
         return True, "OK"
 
+    @classmethod
+    def reserve_unique_click(cls, pk, short_code):
+        """
+        Conta um clique único em link com teto, de forma atômica.
+
+        O UPDATE condicional só casa enquanto unique_clicks < max_clicks, então
+        requisições concorrentes nunca ultrapassam o teto: a que perde a corrida
+        recebe False. O estado passa a exhausted no mesmo comando quando este
+        clique é o último permitido.
+        """
+        with transaction.atomic():
+            reserved = cls.objects.filter(pk=pk, unique_clicks__lt=F("max_clicks")).update(
+                total_clicks=F("total_clicks") + 1,
+                unique_clicks=F("unique_clicks") + 1,
+                state=Case(
+                    When(
+                        unique_clicks__gte=F("max_clicks") - 1,
+                        then=Value(cls.State.EXHAUSTED),
+                    ),
+                    default=F("state"),
+                ),
+                updated_at=timezone.now(),
+            )
+            # Em link com teto, unique_clicks decide o bloqueio: vai para o registro.
+            if reserved:
+                LinkChange.record(LinkChange.Kind.UPSERT, short_code)
+        return bool(reserved)
+
     def increment_clicks(self, is_unique=False):
         self.total_clicks += 1
         if is_unique:
@@ -123,18 +232,97 @@ class ShortenedURL(models.Model):
         self.save(update_fields=["total_clicks", "unique_clicks"])
 
 
+class InternedString(models.Model):
+    """
+    Base das tabelas de dicionário de strings repetidas dos cliques.
+
+    Atributos:
+        hash (str): Hash blake2b (128 bits) do valor, chave única de busca.
+        value (str): O texto original.
+    """
+
+    hash = models.CharField(max_length=32, unique=True, editable=False)
+    value = models.TextField(editable=False)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def intern(cls, value):
+        return intern_string(cls, value)
+
+    @classmethod
+    def derived_fields(cls, value):
+        """Colunas calculadas a partir do valor, gravadas uma vez na internação."""
+        return {}
+
+
+class UserAgent(InternedString):
+    family = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Familia",
+        help_text="Familia do navegador, para agrupar nas analises",
+    )
+
+    class Meta:
+        verbose_name = "User Agent"
+        verbose_name_plural = "User Agents"
+
+    @classmethod
+    def derived_fields(cls, value):
+        from .useragents import user_agent_family
+
+        return {"family": user_agent_family(value)}
+
+
+class Referer(InternedString):
+    domain = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Dominio",
+        help_text="Dominio da referencia, para agrupar nas analises",
+    )
+
+    class Meta:
+        verbose_name = "Referencia"
+        verbose_name_plural = "Referencias"
+
+    @classmethod
+    def derived_fields(cls, value):
+        return {"domain": referer_domain(value)}
+
+
 class Click(models.Model):
     """
     Modelo que representa um clique em uma URL encurtada.
 
     Atributos:
         url (ForeignKey): Referência à URL encurtada clicada.
-        ip_address(str): Endereço IP do usuário que clicou.
-        user_agent(str): Informações do navegador e do sistema operacional do usuário.
-        referer (str): URL de origem do clique.
+        ip_address(str): Endereço IP do usuário que clicou (propriedade sobre ip).
+        ip (bytes): IP compactado, 4 bytes (IPv4) ou 16 (IPv6).
+        ip_prefix (bytes): Rede do IP para agregação, /24 (IPv4) ou /48 (IPv6).
+        user_agent(str): Informações do navegador e do sistema operacional do usuário
+            (propriedade sobre user_agent_ref, internado em UserAgent).
+        referer (str): URL de origem do clique (propriedade sobre referer_ref, em Referer).
+        client_class (str): Pessoa, pré-visualização de link ou robô (pelo user agent).
+        weight (int): Quantos cliques esta linha representa quando há amostragem.
+        country (str): País ISO do IP pelo GEOIP_DATABASE local ("" se desconhecido).
         clicked_at (datetime): Data e hora em que o clique ocorreu
     """
 
+    class ClientClass(models.TextChoices):
+        HUMAN = "human", "Pessoa"
+        PREVIEW = "preview", "Previa de link"
+        BOT = "bot", "Robo"
+
     url = models.ForeignKey(
         ShortenedURL,
         on_delete=models.CASCADE,
@@ -143,22 +331,58 @@ class Click(models.Model):
         help_text="URL encurtada que foi clicada",
     )
 
-    ip_address = models.GenericIPAddressField(
-        verbose_name="Endereco IP", help_text="IP do usuario que clicou"
+    ip = models.BinaryField(
+        max_length=16, verbose_name="Endereco IP", help_text="IP do usuario que clicou"
     )
 
-    user_agent = models.TextField(
-        blank=True, verbose_name="User Agent", help_text="Navegador e sistema operacional"
+    ip_prefix = models.BinaryField(
+        max_length=6,
+        verbose_name="Rede do IP",
+        help_text="Prefixo /24 (IPv4) ou /48 (IPv6) do IP, para agregacao",
     )
 
-    referer = models.URLField(
+    user_agent_ref = models.ForeignKey(
+        UserAgent,
+        null=True,
         blank=True,
+        on_delete=models.PROTECT,
+        related_name="+",
+        verbose_name="User Agent",
+        help_text="Navegador e sistema operacional",
+    )
+
+    referer_ref = models.ForeignKey(
+        Referer,
         null=True,
-        max_length=2048,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="+",
         verbose_name="Referencia",
         help_text="URL de onde veio o clique",
     )
 
+    client_class = models.CharField(
+        max_length=10,
+        choices=ClientClass.choices,
+        default=ClientClass.HUMAN,
+        verbose_name="Origem",
+        help_text="Classificacao do visitante pelo user agent",
+    )
+
+    weight = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Peso",
+        help_text="Quantos cliques esta linha representa (amostragem 1 a cada N)",
+    )
+
+    country = models.CharField(
+        max_length=2,
+        blank=True,
+        default="",
+        verbose_name="Pais",
+        help_text="Codigo ISO do pais do IP (base GeoIP local)",
+    )
+
     clicked_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Clicando em",
@@ -170,10 +394,154 @@ class Click(models.Model):
         verbose_name_plural = "Cliques"
         ordering = ["-clicked_at"]
         indexes = [
-            models.Index(fields=["url", "ip_address"]),
+            models.Index(fields=["url", "ip"]),
+            models.Index(fields=["url", "ip_prefix"]),
             models.Index(fields=["clicked_at"]),
             models.Index(fields=["url", "clicked_at"]),
+            models.Index(fields=["url", "client_class"]),
+            models.Index(fields=["url", "country"]),
+            models.Index(fields=["client_class", "clicked_at"]),
         ]
 
     def __str__(self):
         return f"Clique em {self.url.short_code} - {self.clicked_at}"
+
+    @property
+    def ip_address(self):
+        return unpack_ip(self.ip) if self.ip else None
+
+    @ip_address.setter
+    def ip_address(self, value):
+        self.ip = pack_ip(value)
+        self.ip_prefix = ip_prefix(self.ip)
+
+    # user_agent e referer continuam aceitos como texto (inclusive em
+    # Click(...)/objects.create); save() os troca pelos ids internados.
+    @property
+    def user_agent(self):
+        if hasattr(self, "_user_agent"):
+            return self._user_agent
+        return self.user_agent_ref.value if self.user_agent_ref_id else ""
+
+    @user_agent.setter
+    def user_agent(self, value):
+        self._user_agent = value or ""
+
+    @property
+    def referer(self):
+        if hasattr(self, "_referer"):
+            return self._referer
+        return self.referer_ref.value if self.referer_ref_id else None
+
+    @referer.setter
+    def referer(self, value):
+        self._referer = value or None
+
+    def save(self, *args, **kwargs):
+        if hasattr(self, "_user_agent"):
+            self.user_agent_ref_id = UserAgent.intern(self._user_agent)
+        if hasattr(self, "_referer"):
+            self.referer_ref_id = Referer.intern(self._referer)
+        if not self.country and self.ip:
+            self.country = lookup_country(self.ip)
+        super().save(*args, **kwargs)
+
+
+class Visitor(models.Model):
+    """
+    Primeiro acesso de cada IP a um link: é o que decide se um clique é único.
+
+    Fica separado de Click porque o arquivamento (shortener.archive) apaga os
+    cliques antigos; sem este registro, quem voltasse depois do arquivamento
+    contaria de novo como único (e consumiria o max_clicks). Uma linha por par
+    (link, IP), gravada só no primeiro clique de pessoa, nunca arquivada.
+
+    Atributos:
+        url (ForeignKey): URL encurtada visitada.
+        ip (bytes): IP compactado, 4 bytes (IPv4) ou 16 (IPv6).
+        first_seen_at (datetime): Data e hora do primeiro clique deste IP.
+    """
+
+    url = models.ForeignKey(
+        ShortenedURL,
+        on_delete=models.CASCADE,
+        related_name="visitors",
+        verbose_name="URL",
+        help_text="URL encurtada visitada",
+    )
+
+    ip = models.BinaryField(max_length=16, verbose_name="Endereco IP", help_text="IP do visitante")
+
+    first_seen_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Primeiro acesso",
+        help_text="Data e hora do primeiro clique deste IP no link",
+    )
+
+    class Meta:
+        verbose_name = "Visitante"
+        verbose_name_plural = "Visitantes"
+        constraints = [
+            models.UniqueConstraint(fields=["url", "ip"], name="shortener_visitor_url_ip_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{unpack_ip(self.ip)} em {self.url_id}"
+
+
+class LinkChange(models.Model):
+    """
+    Registro de alterações de links (outbox), lido em ordem de seq.
+
+    Toda escrita que muda o que o redirecionamento decide para um link grava
+    uma linha aqui, na mesma transação: save()/delete() do modelo, operações em
+    massa (shortener.bulk), varredura de estados (shortener.sweeper) e cliques
+    únicos em links com teto. Contadores de links sem teto só atualizam
+    updated_at. Consumidores (tabela de links, caches, réplicas de dados)
+    guardam o último seq aplicado e buscam os seguintes com
+    shortener.changes.poll_link_changes(), em vez de recarregar tudo.
+
+    Atributos:
+        seq (int): Sequência crescente, usada como cursor pelos consumidores.
+        short_code (str): Código do link alterado.
+        kind (str): upsert (criado ou alterado) ou delete (apagado).
+        changed_at (datetime): Data e hora da alteração.
+    """
+
+    class Kind(models.TextChoices):
+        UPSERT = "upsert", "Criado/alterado"
+        DELETE = "delete", "Apagado"
+
+    seq = models.BigAutoField(primary_key=True, verbose_name="Sequencia")
+
+    short_code = models.CharField(
+        max_length=10, verbose_name="Codigo Curto", help_text="Codigo do link alterado"
+    )
+
+    kind = models.CharField(
+        max_length=6,
+        choices=Kind.choices,
+        default=Kind.UPSERT,
+        verbose_name="Tipo",
+        help_text="Criado/alterado ou apagado",
+    )
+
+    changed_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="Alterado em",
+        help_text="Data da alteracao (usada na limpeza do registro)",
+    )
+
+    class Meta:
+        verbose_name = "Alteracao de Link"
+        verbose_name_plural = "Alteracoes de Links"
+        ordering = ["seq"]
+
+    def __str__(self):
+        return f"#{self.seq} {self.kind} {self.short_code}"
+
+    @classmethod
+    def record(cls, kind, *short_codes):
+        if short_codes:
+            cls.objects.bulk_create(cls(short_code=code, kind=kind) for code in short_codes)
@@ -0,0 +1,52 @@
+"""
+Paginador do admin com contagem estimada para tabelas grandes.
+
+O changelist chama count() em toda página. Sem filtro nenhum, isso é um
+COUNT(*) na tabela inteira — no PostgreSQL, uma varredura completa. Nesse caso
+usamos a estimativa do planner (pg_class.reltuples), atualizada pelo
+autovacuum/ANALYZE. Com filtro (inclusive o cursor ?before= do ClickAdmin, que
+vira id < N), a estimativa vem do EXPLAIN da própria consulta. Estimativas
+pequenas, ou fora do PostgreSQL, dão lugar à contagem exata.
+"""
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    # Abaixo disso o COUNT(*) exato é barato e a estimativa só atrapalharia.
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self._estimated_count()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def _estimated_count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+                # reltuples é -1 (PG 14+) ou 0 antes do primeiro ANALYZE.
+                return row[0] if row and row[0] > 0 else None
+
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
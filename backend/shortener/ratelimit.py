@@ -0,0 +1,123 @@
+"""
+Limite de requisições por cliente (IP de get_client_ip) e por rota.
+
+Usa janela deslizante aproximada: o contador da janela atual soma com o da
+anterior ponderado pelo tempo que ainda falta dela. Requisições rejeitadas não
+incrementam nada, então um cliente bloqueado volta assim que a taxa cai.
+
+Backends:
+    memory: contadores no próprio processo (cada worker do gunicorn limita sozinho).
+    cache: contadores no cache do Django, compartilhados entre workers.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .utils import get_client_ip
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class MemoryBackend:
+    """
+    Contadores com validade num LRU protegido por lock: passando de max_keys,
+    cada inserção descarta o contador usado há mais tempo.
+    """
+
+    max_keys = 10000
+
+    def __init__(self):
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._counters.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return 0
+        return entry[0]
+
+    def incr(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            count, expires = self._counters.get(key, (0, now + ttl))
+            if expires <= now:
+                count, expires = 0, now + ttl
+            self._counters[key] = (count + 1, expires)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return count + 1
+
+
+class CacheBackend:
+    """Contadores no cache padrão do Django (Redis/Memcached em produção)."""
+
+    def get(self, key):
+        return cache.get(key, 0)
+
+    def incr(self, key, ttl):
+        cache.add(key, 0, ttl)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, ttl)
+            return 1
+
+
+BACKENDS = {"memory": MemoryBackend, "cache": CacheBackend}
+
+
+@lru_cache(maxsize=None)
+def get_backend(name):
+    return BACKENDS[name]()
+
+
+def parse_rate(rate):
+    """Converte "60/m" em (60, 60)."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+def check_rate_limit(scope, request):
+    """
+    Registra a requisição no limite da rota.
+
+    Retorna 0 quando ela pode seguir ou, quando rejeitada, os segundos que o
+    cliente deve esperar (valor do Retry-After).
+    """
+    rate = settings.RATE_LIMITS.get(scope)
+    if not rate:
+        return 0
+
+    limit, period = parse_rate(rate)
+    backend = get_backend(settings.RATE_LIMIT_BACKEND)
+    key = f"shortener:ratelimit:{scope}:{get_client_ip(request)}"
+
+    now = time.time()
+    window = int(now // period)
+    elapsed = now - window * period
+    current = backend.get(f"{key}:{window}")
+    previous = backend.get(f"{key}:{window - 1}")
+
+    if previous * (1 - elapsed / period) + current + 1 > limit:
+        return max(1, math.ceil(period - elapsed))
+
+    backend.incr(f"{key}:{window}", ttl=2 * period)
+    return 0
+
+
+def rate_limited_response(retry_after):
+    response = HttpResponse(
+        '{"error": "Muitas requisicoes. Tente novamente em instantes."}',
+        content_type="application/json",
+        status=429,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
@@ -0,0 +1,136 @@
+"""
+Roteamento entre o banco primário e as réplicas de leitura.
+
+ReplicaRouter manda escritas para "default" e leituras para uma réplica
+(DATABASES "replica_N", criadas a partir de DATABASE_REPLICA_URLS) cujo atraso
+esteja dentro de DATABASE_REPLICA_MAX_LAG. O atraso é medido no máximo a cada
+DATABASE_REPLICA_LAG_CHECK_INTERVAL segundos por processo; réplica fora do ar
+ou atrasada fica de fora até a próxima medição, e sem nenhuma disponível a
+leitura vai para o primário. A conexão com a réplica tem o limite
+DATABASE_REPLICA_CONNECT_TIMEOUT, já que a medição roda dentro da requisição.
+
+A réplica está em dia quando já reaplicou o WAL até a posição atual do
+primário (lida antes). Senão, o atraso é o tempo desde a última transação
+reaplicada: uma réplica com o recebimento de WAL parado também aparece
+atrasada, e não "sem WAL pendente".
+
+Leituras voltam ao primário quando a consistência importa:
+    - dentro de transaction.atomic() no primário;
+    - depois de qualquer escrita no mesmo contexto (requisição, comando);
+    - depois de pin_to_primary(), para checagens que decidem uma escrita;
+    - em POST/PUT/PATCH/DELETE e nas requisições de um cliente que escreveu
+      há menos de DATABASE_PIN_SECONDS (cookie do DatabasePinMiddleware).
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Atraso de uma réplica que não respondeu à medição.
+UNAVAILABLE = float("inf")
+
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()::text"
+
+# Postgres: réplica que já reaplicou até a posição do primário está em dia,
+# mesmo que o último commit replicado seja antigo (primário ocioso). NULL
+# (nada reaplicado desde que subiu) conta como indisponível.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_pinned = ContextVar("shortener_db_pinned", default=False)
+# alias -> (momento da medição, atraso em segundos)
+_lag_cache = {}
+
+
+def replica_aliases():
+    return [alias for alias in connections if alias.startswith("replica_")]
+
+
+def pin_to_primary():
+    """Leituras seguintes do contexto atual vão para o primário."""
+    _pinned.set(True)
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Isola o estado de fixação por requisição (threads de worker são reaproveitadas)."""
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def primary_lsn():
+    """Posição atual do WAL no primário (None fora do Postgres ou se falhar)."""
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(PRIMARY_LSN_SQL)
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+def measure_lag(alias, lsn):
+    """Atraso da réplica em segundos em relação à posição `lsn` do primário."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    if lsn is None:
+        return UNAVAILABLE
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL, [lsn])
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        return UNAVAILABLE
+    return UNAVAILABLE if lag is None else float(lag)
+
+
+def healthy_replicas():
+    """Réplicas dentro de MAX_LAG; o atraso é medido no máximo a cada LAG_CHECK_INTERVAL."""
+    now = time.monotonic()
+    interval = settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL
+    aliases = replica_aliases()
+    stale = [
+        alias
+        for alias in aliases
+        if alias not in _lag_cache or now - _lag_cache[alias][0] >= interval
+    ]
+    if stale:
+        # A posição do primário é lida antes de medir as réplicas.
+        lsn = primary_lsn()
+        for alias in stale:
+            _lag_cache[alias] = (now, measure_lag(alias, lsn))
+    return [alias for alias in aliases if _lag_cache[alias][1] <= settings.DATABASE_REPLICA_MAX_LAG]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário: objetos de qualquer um se relacionam.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
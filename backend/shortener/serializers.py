@@ -23,12 +23,28 @@ class ClickSerializer(serializers.ModelSerializer):
         ip_address: Endereço IP do usuário
         user_agent: Informações do navegador e do sistema operacional
         referer: URL de origem do clique
+        client_class: Pessoa, prévia de link ou robô
+        weight: Quantos cliques a linha representa quando há amostragem
+        country: País ISO do IP ("" sem base GeoIP)
         clicked_at: Carimbo de data/hora em que o clique ocorreu
     """
 
+    ip_address = serializers.CharField(read_only=True)
+    user_agent = serializers.CharField(read_only=True)
+    referer = serializers.CharField(read_only=True, allow_null=True)
+
     class Meta:
         model = Click
-        fields = ["id", "ip_address", "user_agent", "referer", "clicked_at"]
+        fields = [
+            "id",
+            "ip_address",
+            "user_agent",
+            "referer",
+            "client_class",
+            "weight",
+            "country",
+            "clicked_at",
+        ]
         read_only_fields = fields
 
 
@@ -62,6 +78,7 @@ class ShortenedURLListSerializer(serializers.ModelSerializer):
             "max_clicks",
             "total_clicks",
             "unique_clicks",
+            "state",
             "status",
             "created_at",
         ]
@@ -105,9 +122,11 @@ class ShortenedURLDetailSerializer(serializers.ModelSerializer):
             "is_active",
             "expires_at",
             "max_clicks",
+            "click_sample_rate",
             "total_clicks",
             "unique_clicks",
             "qr_code",
+            "state",
             "statistics",
             "status",
             "recent_clicks",
@@ -134,6 +153,7 @@ class ShortenedURLDetailSerializer(serializers.ModelSerializer):
         return {
             "total_clicks": obj.total_clicks,
             "unique_clicks": obj.unique_clicks,
+            "bot_clicks": obj.bot_clicks,
             "is_expired": obj.is_expired(),
             "has_reached_max_clicks": obj.has_reached_max_clicks(),
         }
@@ -143,7 +163,7 @@ class ShortenedURLDetailSerializer(serializers.ModelSerializer):
         return {"can_access": can_access, "message": message}
 
     def get_recent_clicks(self, obj):
-        recent = obj.clicks.all()[:10]
+        recent = obj.clicks.select_related("user_agent_ref", "referer_ref")[:10]
         return ClickSerializer(recent, many=True).data
 
 
@@ -168,7 +188,7 @@ class ShortenedURLCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ShortenedURL
-        fields = ["original_url", "short_code", "expires_at", "max_clicks"]
+        fields = ["original_url", "short_code", "expires_at", "max_clicks", "click_sample_rate"]
 
     def validate_short_code(self, value):
         if value:
@@ -221,11 +241,12 @@ class ShortenedURLUpdateSerializer(serializers.ModelSerializer):
         is_active: Status ativo/inativo
         expires_at: Data/hora de expiração
         max_clicks: Limite máximo de cliques
+        click_sample_rate: Amostragem dos cliques repetidos (1 a cada N)
     """
 
     class Meta:
         model = ShortenedURL
-        fields = ["original_url", "is_active", "expires_at", "max_clicks"]
+        fields = ["original_url", "is_active", "expires_at", "max_clicks", "click_sample_rate"]
 
     def validate_expires_at(self, value):
         if value and value <= timezone.now():
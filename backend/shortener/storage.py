@@ -0,0 +1,49 @@
+"""
+Armazenamento dos QR Codes, endereçado pelo conteúdo.
+
+Os PNGs vão para o storage "qrcodes" de settings.STORAGES (sistema de arquivos
+por padrão; qualquer backend do Django, como o S3Storage do django-storages
+apontado para um MinIO, via QR_STORAGE_BACKEND/QR_STORAGE_OPTIONS). O nome do
+arquivo é o sha256 do conteúdo:
+
+    qrcodes/<2 primeiros hex>/<sha256>.png
+
+O PNG codifica a URL curta, que inclui o short_code: cada link tem a sua
+imagem, e o nome pelo conteúdo não serve para deduplicar. Ele serve para que
+um nome nunca mude de conteúdo: o nginx (ou o CDN/bucket) pode servi-los com
+cache imutável de longa duração, sem passar pelo Django.
+
+Os arquivos nunca devem ser apagados junto com um link: save_qr_code()
+reaproveita um nome que já existe, então um mesmo arquivo pode estar
+referenciado por mais de um registro. Limpeza de órfãos, se um dia existir,
+precisa conferir que nenhum ShortenedURL.qr_code aponta para o arquivo.
+"""
+
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+QR_STORAGE_ALIAS = "qrcodes"
+
+
+def qr_code_storage():
+    """Storage do campo ShortenedURL.qr_code (resolvido em tempo de execução)."""
+    return storages[QR_STORAGE_ALIAS]
+
+
+def content_addressed_name(content, prefix="qrcodes", extension="png"):
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{prefix}/{digest[:2]}/{digest}.{extension}"
+
+
+def save_qr_code(file):
+    """Grava o PNG (se ainda não existir) e devolve o nome no storage."""
+    content = file.read()
+    name = content_addressed_name(content)
+    storage = qr_code_storage()
+    if storage.exists(name):
+        return name
+    # Em corrida com outra gravação do mesmo conteúdo, o storage pode escolher
+    # outro nome livre; vale o nome devolvido.
+    return storage.save(name, ContentFile(content))
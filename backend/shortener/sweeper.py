@@ -0,0 +1,63 @@
+"""
+Varredura do estado denormalizado dos links.
+
+Expiração e esgotamento do teto de cliques acontecem sem nenhuma escrita no
+link; esta varredura move esses links para o estado correspondente e limpa o
+cache de redirecionamento deles, registrando a mudança em LinkChange.
+"""
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import purge_redirect_cache
+from .models import LinkChange, ShortenedURL
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def refresh_link_states(queryset, now=None):
+    """Recalcula o estado das linhas do queryset em um único UPDATE."""
+    short_codes = list(queryset.values_list("short_code", flat=True))
+    with transaction.atomic():
+        updated = ShortenedURL.objects.filter(short_code__in=short_codes).update(
+            state=ShortenedURL.state_expression(now), updated_at=timezone.now()
+        )
+        LinkChange.record(LinkChange.Kind.UPSERT, *short_codes)
+    purge_redirect_cache(*short_codes)
+    return updated
+
+
+def sweep_link_states(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Move links ativos vencidos para expired e os que atingiram o teto para exhausted.
+
+    Retorna um dicionário com a quantidade de links movidos para cada estado.
+    """
+    now = now or timezone.now()
+    active = ShortenedURL.objects.filter(state=ShortenedURL.State.ACTIVE)
+    targets = {
+        ShortenedURL.State.EXPIRED: active.filter(expires_at__lt=now),
+        ShortenedURL.State.EXHAUSTED: active.filter(
+            Q(max_clicks__gt=0) & Q(unique_clicks__gte=F("max_clicks"))
+        ),
+    }
+
+    moved = {}
+    for state, queryset in targets.items():
+        moved[state.value] = 0
+        while True:
+            batch = list(queryset.values_list("pk", "short_code")[:batch_size])
+            if not batch:
+                break
+            pks = [pk for pk, _code in batch]
+            codes = [code for _pk, code in batch]
+            with transaction.atomic():
+                # O filtro do estado volta no UPDATE: link editado depois do
+                # SELECT (reativado, expiração estendida) fica como está.
+                moved[state.value] += queryset.filter(pk__in=pks).update(
+                    state=state, updated_at=timezone.now()
+                )
+                LinkChange.record(LinkChange.Kind.UPSERT, *codes)
+            purge_redirect_cache(*codes)
+    return moved
@@ -1,8 +1,19 @@
+from datetime import timedelta
+from unittest import mock, skipUnless
+
 from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from shortener.admin import ClickAdmin, ShortenedURLAdmin
-from shortener.models import Click, ShortenedURL
+from shortener.cache import get_redirect_entry, redirect_cache_key
+from shortener.models import Click, LinkChange, ShortenedURL
+from shortener.paginators import EstimatedCountPaginator
 
 
 class ShortenedURLAdminTest(TestCase):
@@ -20,6 +31,11 @@ class ShortenedURLAdminTest(TestCase):
                 ip_address=f"10.0.0.{index}",
                 user_agent="Mozilla/5.0",
             )
+        # O rodapé usa o contador desnormalizado, que o redirecionamento mantém.
+        ShortenedURL.objects.filter(pk=self.url.pk).update(
+            total_clicks=F("total_clicks") + quantity
+        )
+        self.url.refresh_from_db()
 
     def test_recent_clicks_display_without_clicks(self):
         html = self.admin.recent_clicks_display(self.url)
@@ -39,6 +55,16 @@ class ShortenedURLAdminTest(TestCase):
         html = self.admin.recent_clicks_display(self.url)
         self.assertIn("Mostrando 10 de 11 cliques totais", html)
 
+    def test_recent_clicks_display_is_one_query_and_escaped(self):
+        Click.objects.create(url=self.url, ip_address="10.0.0.9", user_agent="<script>x</script>")
+        with self.assertNumQueries(1):
+            html = self.admin.recent_clicks_display(self.url)
+            self.admin.recent_clicks_display(self.url)
+            self.admin.click_stats(self.url)
+            self.admin.access_status_display(self.url)
+        self.assertIn("&lt;script&gt;", html)
+        self.assertNotIn("<script>", html)
+
     # As colunas abaixo entram na listagem: um retorno que levanta excecao
     # derruba a pagina inteira, nao apenas a celula.
     def test_qr_preview_without_qr_code(self):
@@ -60,6 +86,83 @@ class ShortenedURLAdminTest(TestCase):
     def test_access_status_display(self):
         self.assertIn("Acessível", self.admin.access_status_display(self.url))
 
+    def test_changelist_queryset_does_not_join_clicks(self):
+        queryset = self.admin.get_queryset(None)
+        self.assertNotIn("shortener_click", str(queryset.query))
+
+    def test_audit_click_counters(self):
+        self._add_clicks(2)
+        ShortenedURL.objects.filter(pk=self.url.pk).update(total_clicks=2, unique_clicks=2)
+        with mock.patch.object(self.admin, "message_user") as message_user:
+            self.admin.audit_click_counters(None, ShortenedURL.objects.all())
+        self.assertIn("conferem", message_user.call_args.args[1])
+
+        ShortenedURL.objects.filter(pk=self.url.pk).update(total_clicks=5)
+        with mock.patch.object(self.admin, "message_user") as message_user:
+            self.admin.audit_click_counters(None, ShortenedURL.objects.all())
+        self.assertIn("admin1 (total 5/2, únicos 2/2)", message_user.call_args.args[1])
+
+    def test_delete_expired_urls_removes_clicks(self):
+        self._add_clicks(2)
+        ShortenedURL.objects.filter(pk=self.url.pk).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        with mock.patch.object(self.admin, "message_user") as message_user:
+            self.admin.delete_expired_urls(None, ShortenedURL.objects.all())
+        self.assertIn(
+            "1 URL(s) expirada(s) deletada(s), com 2 clique(s)", message_user.call_args.args[1]
+        )
+        self.assertFalse(Click.objects.exists())
+
+    def test_delete_selected_records_change_and_purges_cache(self):
+        self._add_clicks(2)
+        get_redirect_entry(self.url.short_code)
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "senha")
+        self.client.force_login(admin_user)
+
+        response = self.client.post(
+            "/admin/shortener/shortenedurl/",
+            {"action": "delete_selected", "_selected_action": [self.url.pk], "post": "yes"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ShortenedURL.objects.exists())
+        self.assertFalse(Click.objects.exists())
+        self.assertTrue(
+            LinkChange.objects.filter(
+                kind=LinkChange.Kind.DELETE, short_code=self.url.short_code
+            ).exists()
+        )
+        self.assertIsNone(cache.get(redirect_cache_key(self.url.short_code)))
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        for index in range(3):
+            ShortenedURL.objects.create(original_url="https://example.com", short_code=f"p{index}")
+
+    def test_exact_count_without_estimate(self):
+        paginator = EstimatedCountPaginator(ShortenedURL.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+
+    def test_uses_estimate_for_large_unfiltered_tables(self):
+        with mock.patch.object(
+            EstimatedCountPaginator, "_estimated_count", return_value=50_000_000
+        ):
+            paginator = EstimatedCountPaginator(ShortenedURL.objects.all(), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 50_000_000)
+
+    def test_small_estimate_is_counted_exactly(self):
+        paginator = EstimatedCountPaginator(ShortenedURL.objects.filter(short_code="p1"), 2)
+        with mock.patch.object(EstimatedCountPaginator, "_estimated_count", return_value=1):
+            self.assertEqual(paginator.count, 1)
+
+    @skipUnless(connection.vendor == "postgresql", "estimativa do planner do PostgreSQL")
+    def test_filtered_queryset_is_estimated_by_explain(self):
+        paginator = EstimatedCountPaginator(ShortenedURL.objects.filter(pk__lt=10**9), 2)
+        self.assertIsInstance(paginator._estimated_count(), int)
+
 
 class ClickAdminTest(TestCase):
     def setUp(self):
@@ -74,6 +177,11 @@ class ClickAdminTest(TestCase):
             user_agent="Mozilla/5.0",
         )
 
+    def test_search_by_exact_ip(self):
+        Click.objects.create(url=self.url, ip_address="10.0.0.2")
+        results, _ = self.admin.get_search_results(None, Click.objects.all(), "10.0.0.1")
+        self.assertEqual(list(results), [self.click])
+
     def test_referer_display_without_referer(self):
         self.assertIn("-", self.admin.referer_display(self.click))
 
@@ -87,3 +195,58 @@ class ClickAdminTest(TestCase):
 
     def test_user_agent_formatted_with_user_agent(self):
         self.assertIn("Mozilla/5.0", self.admin.user_agent_formatted(self.click))
+
+
+class ClickChangelistTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "senha")
+        self.client.force_login(user)
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="admin3",
+        )
+        self.clicks = [
+            Click.objects.create(
+                url=self.url, ip_address=f"10.0.0.{index}", referer="https://r.com"
+            )
+            for index in range(3)
+        ]
+
+    def _changelist(self, **params):
+        return self.client.get("/admin/shortener/click/", params)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as three_rows:
+            self._changelist()
+        for index in range(3, 10):
+            Click.objects.create(
+                url=self.url, ip_address=f"10.0.0.{index}", referer="https://r.com"
+            )
+        with CaptureQueriesContext(connection) as ten_rows:
+            self._changelist()
+        self.assertEqual(len(three_rows), len(ten_rows))
+
+    def test_cursor_page_uses_estimated_count(self):
+        with mock.patch.object(
+            EstimatedCountPaginator, "_estimated_count", return_value=50_000_000
+        ) as estimated:
+            response = self._changelist(before=self.clicks[2].pk)
+        self.assertEqual(response.status_code, 200)
+        estimated.assert_called()
+        self.assertEqual(response.context["cl"].result_count, 50_000_000)
+
+    def test_filter_by_client_class(self):
+        bot = Click.objects.create(url=self.url, ip_address="10.0.1.1", client_class="bot")
+        response = self._changelist(client_class__exact="bot")
+        self.assertEqual([click.pk for click in response.context["cl"].result_list], [bot.pk])
+
+    def test_cursor_navigation(self):
+        response = self._changelist()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["next_cursor_url"], f"?before={self.clicks[0].pk}")
+
+        response = self._changelist(before=self.clicks[2].pk)
+        self.assertEqual(
+            [click.pk for click in response.context["cl"].result_list],
+            [self.clicks[1].pk, self.clicks[0].pk],
+        )
@@ -0,0 +1,112 @@
+"""
+Orçamento de consultas SQL e de tempo por endpoint.
+
+A tabela em query_budgets.json fixa quantas consultas cada endpoint faz e um
+teto de tempo (folgado, só para pegar regressões grosseiras). Um N+1 ou uma
+ida extra ao banco quebra o teste; ao reduzir consultas de propósito,
+atualize o número no JSON junto com a mudança.
+"""
+
+import itertools
+import json
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.pagination import PageNumberPagination
+
+from shortener.models import Click, ShortenedURL
+
+BUDGETS = json.loads((Path(__file__).parent / "query_budgets.json").read_text())
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "senha")
+        for index in range(120):
+            ShortenedURL.objects.create(
+                original_url=f"https://example.com/{index}", short_code=f"budget{index}"
+            )
+        cls.url = ShortenedURL.objects.get(short_code="budget0")
+        for index in range(30):
+            Click.objects.create(
+                url=cls.url,
+                ip_address=f"10.0.0.{index}",
+                user_agent=f"Mozilla/5.0 Budget/{index % 3}",
+                referer=f"https://origem{index % 4}.com/",
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.addresses = (f"10.77.{n // 256}.{n % 256}" for n in itertools.count())
+
+    def assertWithinBudget(self, name, request):
+        budget = BUDGETS[name]
+        # Primeira chamada fora da medição: caches de processo (templates, content types).
+        request()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.assertLess(response.status_code, 400, name)
+        self.assertEqual(
+            len(queries),
+            budget["queries"],
+            f"{name}: {len(queries)} consultas (orçamento {budget['queries']}):\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        self.assertLess(elapsed_ms, budget["max_ms"], f"{name}: {elapsed_ms:.1f} ms")
+
+    def test_redirect_unique_visitor(self):
+        self.assertWithinBudget(
+            "redirect_unique",
+            lambda: self.client.get("/api/r/budget0/", REMOTE_ADDR=next(self.addresses)),
+        )
+
+    def test_redirect_repeat_visitor(self):
+        self.assertWithinBudget(
+            "redirect_repeat",
+            lambda: self.client.get("/api/r/budget0/", REMOTE_ADDR="10.0.0.1"),
+        )
+
+    def test_list_page_10(self):
+        self.assertWithinBudget("list_page_10", lambda: self.client.get("/api/urls/"))
+
+    def test_list_page_100(self):
+        with mock.patch.object(PageNumberPagination, "page_size", 100):
+            self.assertWithinBudget("list_page_100", lambda: self.client.get("/api/urls/"))
+
+    def test_retrieve(self):
+        self.assertWithinBudget("retrieve", lambda: self.client.get("/api/urls/budget0/"))
+
+    def test_statistics(self):
+        self.assertWithinBudget(
+            "statistics", lambda: self.client.get("/api/urls/budget0/statistics/")
+        )
+
+    def test_admin_url_changelist(self):
+        self.client.force_login(self.user)
+        self.assertWithinBudget(
+            "admin_url_changelist", lambda: self.client.get("/admin/shortener/shortenedurl/")
+        )
+
+    def test_admin_url_change(self):
+        self.client.force_login(self.user)
+        self.assertWithinBudget(
+            "admin_url_change",
+            lambda: self.client.get(f"/admin/shortener/shortenedurl/{self.url.pk}/change/"),
+        )
+
+    def test_admin_click_changelist(self):
+        self.client.force_login(self.user)
+        self.assertWithinBudget(
+            "admin_click_changelist", lambda: self.client.get("/admin/shortener/click/")
+        )
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shortener.bulk import delete_links, set_links_active
+from shortener.changes import poll_link_changes, prune_link_changes
+from shortener.models import LinkChange, ShortenedURL
+from shortener.sweeper import sweep_link_states
+
+
+def _log():
+    return list(LinkChange.objects.values_list("kind", "short_code"))
+
+
+class LinkChangeFeedTest(TestCase):
+    def setUp(self):
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com", short_code="feed1"
+        )
+        LinkChange.objects.all().delete()
+
+    def test_save_and_delete_are_recorded(self):
+        self.url.original_url = "https://example.com/novo"
+        self.url.save()
+        self.url.delete()
+        self.assertEqual(_log(), [("upsert", "feed1"), ("delete", "feed1")])
+
+    def test_bulk_operations_and_sweeper_are_recorded(self):
+        other = ShortenedURL.objects.create(
+            original_url="https://example.com/2", short_code="feed2"
+        )
+        ShortenedURL.objects.filter(pk=other.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        LinkChange.objects.all().delete()
+
+        set_links_active(ShortenedURL.objects.filter(pk=self.url.pk), active=False)
+        sweep_link_states()
+        delete_links(ShortenedURL.objects.all())
+
+        self.assertEqual(
+            _log(),
+            [
+                ("upsert", "feed1"),
+                ("upsert", "feed2"),
+                ("delete", "feed1"),
+                ("delete", "feed2"),
+            ],
+        )
+
+    def test_capped_unique_click_is_recorded(self):
+        self.url.max_clicks = 1
+        self.url.save()
+        LinkChange.objects.all().delete()
+
+        self.client.get("/api/r/feed1/", REMOTE_ADDR="10.31.0.1")
+        self.assertEqual(_log(), [("upsert", "feed1")])
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.state, ShortenedURL.State.EXHAUSTED)
+
+    def test_counter_updates_bump_updated_at(self):
+        before = self.url.updated_at
+        self.client.get("/api/r/feed1/", REMOTE_ADDR="10.31.0.2")
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.total_clicks, 1)
+        self.assertGreater(self.url.updated_at, before)
+        # Contador de link sem teto não muda o redirecionamento: fora do registro.
+        self.assertEqual(_log(), [])
+
+
+@override_settings(LINK_CHANGE_GAP_GRACE=10, LINK_CHANGE_RETENTION_DAYS=7)
+class PollLinkChangesTest(TestCase):
+    def _change(self, seq, age=0):
+        return LinkChange.objects.create(
+            seq=seq, short_code=f"c{seq}", changed_at=timezone.now() - timedelta(seconds=age)
+        )
+
+    def test_cursor_stops_before_recent_gap(self):
+        for seq in (1, 2, 4):
+            self._change(seq)
+        changes, cursor = poll_link_changes(0)
+        self.assertEqual([change["seq"] for change in changes], [1, 2, 4])
+        self.assertEqual(cursor, 2)
+
+    def test_cursor_skips_old_gap(self):
+        self._change(1, age=60)
+        self._change(3, age=60)
+        self.assertEqual(poll_link_changes(0)[1], 3)
+        self.assertEqual(poll_link_changes(3), ([], 3))
+
+    def test_prune_removes_changes_past_retention(self):
+        self._change(1, age=8 * 86400)
+        self._change(2)
+        self.assertEqual(prune_link_changes(), 1)
+        self.assertEqual(list(LinkChange.objects.values_list("seq", flat=True)), [2])
+
+    def test_api_returns_changes_and_next_cursor(self):
+        self._change(1)
+        self._change(2)
+        response = self.client.get("/api/changes/", {"after": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["next"], 2)
+        self.assertEqual([c["short_code"] for c in response.json()["changes"]], ["c2"])
+
+        self.assertEqual(self.client.get("/api/changes/", {"after": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/changes/", {"limit": 0}).status_code, 400)
@@ -0,0 +1,358 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shortener import archive
+from shortener.archive import archive_clicks, archive_cutoff, iter_archived_clicks, partition_path
+from shortener.cache import get_redirect_entry
+from shortener.geoip import _open_index
+from shortener.models import Click, ShortenedURL
+from shortener.sweeper import sweep_link_states
+
+
+class SweepLinksCommandTest(TestCase):
+    def setUp(self):
+        self.expiring = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="sweep1",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.capped = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="sweep2",
+            max_clicks=2,
+        )
+        self.untouched = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="sweep3",
+        )
+
+    def test_moves_expired_and_exhausted_links(self):
+        # Vencimento e teto acontecem sem passar pelo save().
+        ShortenedURL.objects.filter(pk=self.expiring.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        ShortenedURL.objects.filter(pk=self.capped.pk).update(unique_clicks=2)
+
+        out = StringIO()
+        call_command("sweep_links", stdout=out)
+
+        self.assertIn("1 link(s) expirado(s), 1 esgotado(s)", out.getvalue())
+        states = dict(ShortenedURL.objects.values_list("short_code", "state"))
+        self.assertEqual(states["sweep1"], ShortenedURL.State.EXPIRED)
+        self.assertEqual(states["sweep2"], ShortenedURL.State.EXHAUSTED)
+        self.assertEqual(states["sweep3"], ShortenedURL.State.ACTIVE)
+
+    def test_link_extended_after_select_is_not_expired(self):
+        ShortenedURL.objects.filter(pk=self.expiring.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        atomic = transaction.atomic
+
+        def extend_then_atomic(*args, **kwargs):
+            # Edição concorrente entre o SELECT do lote e o UPDATE.
+            ShortenedURL.objects.filter(pk=self.expiring.pk).update(
+                expires_at=timezone.now() + timedelta(days=1)
+            )
+            return atomic(*args, **kwargs)
+
+        with mock.patch("shortener.sweeper.transaction.atomic", side_effect=extend_then_atomic):
+            moved = sweep_link_states()
+
+        self.assertEqual(moved[ShortenedURL.State.EXPIRED.value], 0)
+        self.expiring.refresh_from_db()
+        self.assertEqual(self.expiring.state, ShortenedURL.State.ACTIVE)
+
+    def test_purges_redirect_cache(self):
+        self.assertEqual(get_redirect_entry("sweep1")["state"], ShortenedURL.State.ACTIVE)
+        ShortenedURL.objects.filter(pk=self.expiring.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command("sweep_links", stdout=StringIO())
+
+        self.assertEqual(get_redirect_entry("sweep1")["state"], ShortenedURL.State.EXPIRED)
+
+
+class ArchiveClicksCommandTest(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        settings_override = override_settings(CLICK_ARCHIVE_ROOT=self.archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="archive",
+        )
+        self.old = Click.objects.create(url=self.url, ip_address="10.0.0.1", user_agent="UA/1")
+        Click.objects.create(url=self.url, ip_address="10.0.0.2", weight=5)
+        self.recent = Click.objects.create(url=self.url, ip_address="10.0.0.3")
+        Click.objects.exclude(pk=self.recent.pk).update(
+            clicked_at=timezone.now() - timedelta(days=40)
+        )
+        self.old_day = timezone.localdate(Click.objects.get(pk=self.old.pk).clicked_at)
+
+    def test_moves_old_clicks_to_compressed_partitions(self):
+        out = StringIO()
+        call_command("archive_clicks", "--days", "30", stdout=out)
+
+        self.assertIn("2 clique(s)", out.getvalue())
+        self.assertEqual(list(Click.objects.all()), [self.recent])
+        self.assertTrue(partition_path(self.old_day, self.url.pk).exists())
+
+        records = list(iter_archived_clicks(self.url.pk))
+        self.assertEqual({r["ip_address"] for r in records}, {"10.0.0.1", "10.0.0.2"})
+        self.assertIn("UA/1", {r["user_agent"] for r in records})
+
+    def test_archived_record_keeps_country(self):
+        Click.objects.filter(pk=self.old.pk).update(country="BR")
+        archive_clicks(timezone.now() - timedelta(days=30))
+
+        records = {r["ip_address"]: r for r in iter_archived_clicks(self.url.pk)}
+        self.assertEqual(records["10.0.0.1"]["country"], "BR")
+        self.assertEqual(records["10.0.0.2"]["country"], "")
+
+    def test_reader_defaults_country_for_older_partitions(self):
+        path = partition_path(self.old_day, self.url.pk)
+        path.parent.mkdir(parents=True)
+        clicked_at = timezone.now() - timedelta(days=40)
+        with gzip.open(path, "wt", encoding="utf-8") as handle:
+            handle.write(json.dumps({"id": 1, "weight": 1, "clicked_at": clicked_at.isoformat()}))
+
+        (record,) = iter_archived_clicks(self.url.pk)
+        self.assertEqual(record["country"], "")
+
+    def test_rerun_after_crash_before_delete_does_not_duplicate(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        with mock.patch("django.db.models.query.QuerySet.delete", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive_clicks(cutoff, batch_size=1)
+        # O lote foi confirmado no manifest antes de cair: o corte já vale.
+        self.assertEqual(archive_cutoff(), cutoff)
+        self.assertEqual(Click.objects.count(), 3)
+
+        archive_clicks(cutoff, batch_size=1)
+
+        self.assertEqual(list(Click.objects.all()), [self.recent])
+        self.assertEqual(len(list(iter_archived_clicks(self.url.pk))), 2)
+
+    def test_rerun_after_crash_before_confirm_does_not_duplicate(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        write_manifest = archive._write_manifest
+        calls = []
+
+        def crash_on_confirm(manifest):
+            calls.append(manifest)
+            if len(calls) == 2:
+                raise RuntimeError
+            write_manifest(manifest)
+
+        with mock.patch("shortener.archive._write_manifest", side_effect=crash_on_confirm):
+            with self.assertRaises(RuntimeError):
+                archive_clicks(cutoff)
+        # Os cliques já estão anexados à partição, mas ainda não foram confirmados.
+        self.assertEqual(len(list(iter_archived_clicks(self.url.pk))), 2)
+        self.assertEqual(Click.objects.count(), 3)
+
+        archive_clicks(cutoff)
+
+        self.assertEqual(list(Click.objects.all()), [self.recent])
+        self.assertEqual(len(list(iter_archived_clicks(self.url.pk))), 2)
+
+    def test_statistics_range_reads_archive(self):
+        call_command("archive_clicks", "--days", "30", stdout=StringIO())
+        since = (timezone.now() - timedelta(days=60)).date().isoformat()
+
+        response = self.client.get("/api/urls/archive/statistics/", {"since": since})
+
+        self.assertEqual(response.data["clicks_in_range"]["clicks"], 7)  # type: ignore
+
+    def test_returning_visitor_is_not_unique_after_archive(self):
+        capped = ShortenedURL.objects.create(
+            original_url="https://example.com", short_code="capped", max_clicks=2
+        )
+        self.client.get("/api/r/capped/", REMOTE_ADDR="1.1.1.1")
+        Click.objects.filter(url=capped).update(clicked_at=timezone.now() - timedelta(days=40))
+        call_command("archive_clicks", "--days", "30", stdout=StringIO())
+        self.assertFalse(Click.objects.filter(url=capped).exists())
+
+        self.client.get("/api/r/capped/", REMOTE_ADDR="1.1.1.1")
+        capped.refresh_from_db()
+        self.assertEqual((capped.total_clicks, capped.unique_clicks), (2, 1))
+        response = self.client.get("/api/r/capped/", REMOTE_ADDR="2.2.2.2")
+        self.assertEqual(response.status_code, 302)
+
+    def test_statistics_rejects_invalid_range(self):
+        response = self.client.get("/api/urls/archive/statistics/", {"since": "ontem"})
+        self.assertEqual(response.status_code, 400)
+
+
+class GeoIPCommandsTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.source = os.path.join(self.tmp, "ranges.csv")
+        with open(self.source, "w") as file:
+            file.write("10.0.0.0,10.0.255.255,BR\n")
+        self.database = os.path.join(self.tmp, "geoip.bin")
+        self.addCleanup(_open_index.cache_clear)
+
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="geo",
+        )
+
+    def test_compile_then_enrich_and_backfill(self):
+        before = Click.objects.create(url=self.url, ip_address="10.0.0.1")
+        self.assertEqual(before.country, "")
+
+        out = StringIO()
+        call_command("compile_geoip", self.source, output=self.database, stdout=out)
+        self.assertIn("1 faixa(s)", out.getvalue())
+
+        with override_settings(GEOIP_DATABASE=self.database):
+            enriched = Click.objects.create(url=self.url, ip_address="10.0.3.4")
+            self.assertEqual(enriched.country, "BR")
+
+            call_command("backfill_click_countries", stdout=StringIO())
+
+        before.refresh_from_db()
+        self.assertEqual(before.country, "BR")
+
+    def test_invalid_database_is_ignored_with_one_warning(self):
+        for content in (b"", b"nao e uma base geoip"):
+            _open_index.cache_clear()
+            with open(self.database, "wb") as file:
+                file.write(content)
+
+            with override_settings(GEOIP_DATABASE=self.database):
+                with self.assertLogs("shortener.geoip", "WARNING") as logs:
+                    first = Click.objects.create(url=self.url, ip_address="10.0.0.1")
+                    second = Click.objects.create(url=self.url, ip_address="10.0.0.2")
+
+            self.assertEqual((first.country, second.country), ("", ""))
+            self.assertEqual(len(logs.records), 1)
+
+    def test_backfill_requires_database(self):
+        with self.assertRaises(CommandError):
+            call_command("backfill_click_countries", stdout=StringIO())
+
+
+class BulkLinksCommandTest(TestCase):
+    def setUp(self):
+        self.expired = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="bulk1",
+            expires_at=timezone.now() - timedelta(days=1),
+        )
+        self.active = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="bulk2",
+        )
+        for index in range(3):
+            Click.objects.create(url=self.expired, ip_address=f"10.0.0.{index}")
+        Click.objects.create(url=self.active, ip_address="10.0.1.1")
+
+    def test_delete_expired_removes_links_and_clicks_in_batches(self):
+        out = StringIO()
+        call_command("bulk_links", "delete", expired=True, batch_size=1, stdout=out)
+
+        self.assertIn("1 link(s) e 3 clique(s) apagado(s).", out.getvalue())
+        self.assertEqual(list(ShortenedURL.objects.values_list("short_code", flat=True)), ["bulk2"])
+        self.assertEqual(Click.objects.count(), 1)
+
+    def test_deactivate_updates_state_and_cache(self):
+        self.assertEqual(get_redirect_entry("bulk2")["state"], ShortenedURL.State.ACTIVE)
+
+        call_command("bulk_links", "deactivate", all=True, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(ShortenedURL.objects.filter(is_active=True).exists())
+        self.assertEqual(get_redirect_entry("bulk2")["state"], ShortenedURL.State.INACTIVE)
+
+    def test_requires_a_filter(self):
+        with self.assertRaises(CommandError):
+            call_command("bulk_links", "delete", stdout=StringIO())
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_reports_latency_and_queries_per_endpoint(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            links=3,
+            clicks=10,
+            requests=5,
+            warmup=1,
+            label="ci",
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["label"], "ci")
+        self.assertEqual(
+            set(report["endpoints"]), {"redirect", "list", "detail", "statistics", "create"}
+        )
+        for name, result in report["endpoints"].items():
+            self.assertEqual(result["requests"], 5, name)
+            self.assertEqual(result["errors"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries_per_request"], 0)
+        # Os dados semeados e os links criados pelo create são removidos no fim.
+        self.assertFalse(ShortenedURL.objects.exists())
+        self.assertFalse(Click.objects.exists())
+
+    def test_rejects_unknown_endpoint(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark", endpoints="redirect,foo", stdout=StringIO())
+
+    def test_skips_prefix_in_use_and_keeps_existing_links(self):
+        existing = ShortenedURL.objects.create(
+            original_url="https://example.com", short_code="zbaa00001"
+        )
+        Click.objects.create(url=existing, ip_address="10.0.0.1")
+
+        with mock.patch("random.choices", side_effect=[["a", "a"], ["b", "b"]]):
+            call_command("benchmark", links=2, clicks=4, requests=2, warmup=0, stdout=StringIO())
+
+        self.assertEqual(list(ShortenedURL.objects.all()), [existing])
+        self.assertEqual(Click.objects.filter(url=existing).count(), 1)
+
+    def test_refuses_to_run_without_free_prefix(self):
+        ShortenedURL.objects.create(original_url="https://example.com", short_code="zbaa00001")
+        with mock.patch("random.choices", return_value=["a", "a"]):
+            with self.assertRaises(CommandError):
+                call_command("benchmark", links=1, stdout=StringIO())
+        self.assertEqual(ShortenedURL.objects.count(), 1)
+
+    def test_importtime_reports_startup_without_qr_libraries(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            links=1,
+            clicks=0,
+            requests=1,
+            warmup=0,
+            endpoints="redirect",
+            importtime=True,
+            stdout=out,
+        )
+
+        startup = json.loads(out.getvalue())["startup"]
+        self.assertGreater(startup["import_ms"], 0)
+        self.assertGreater(startup["max_rss_kb"], 0)
+        self.assertTrue(startup["top_imports"])
+        # Subir o worker e carregar as views não pode puxar qrcode/Pillow.
+        self.assertEqual(startup["heavy_modules"], [])
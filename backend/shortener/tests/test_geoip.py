@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from shortener.geoip import GeoIPIndex, compile_geoip_database
+from shortener.utils import pack_ip
+
+CSV = """network,country_iso_code
+10.0.0.0/16,BR
+2001:db8::/32,PT
+"11.0.0.0","11.0.0.255","US","United States"
+184549632,184549887,AR,Argentina
+12.0.0.0,12.0.0.255,-,-
+"""
+
+
+class GeoIPIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        source = os.path.join(self.tmp, "ranges.csv")
+        with open(source, "w") as file:
+            file.write(CSV)
+        self.path = os.path.join(self.tmp, "geoip.bin")
+        self.count = compile_geoip_database(source, self.path)
+        self.index = GeoIPIndex(self.path)
+
+    def test_skips_header_and_unknown_countries(self):
+        self.assertEqual(self.count, 4)
+        self.assertEqual(len(self.index), 4)
+
+    def test_lookup_ranges(self):
+        for ip, country in (
+            ("10.0.0.0", "BR"),
+            ("10.0.255.255", "BR"),
+            ("10.1.0.0", ""),
+            ("11.0.0.128", "US"),
+            # 184549632 = 11.0.1.0 (IP como inteiro, estilo IP2Location).
+            ("11.0.1.7", "AR"),
+            ("9.255.255.255", ""),
+            ("12.0.0.1", ""),
+            ("2001:db8:1::1", "PT"),
+            ("2001:db9::1", ""),
+        ):
+            self.assertEqual(self.index.lookup(pack_ip(ip)), country, ip)
+
+    def test_rejects_foreign_file(self):
+        path = os.path.join(self.tmp, "other.bin")
+        with open(path, "wb") as file:
+            file.write(b"not a geoip database")
+        with self.assertRaises(ValueError):
+            GeoIPIndex(path)
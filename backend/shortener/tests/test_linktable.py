@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shortener import linktable
+from shortener.models import ShortenedURL
+
+
+@override_settings(LINK_TABLE_ENABLED=True, LINK_TABLE_REFRESH_INTERVAL=3600)
+class LinkTableTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        linktable._table = None
+        self.addCleanup(setattr, linktable, "_table", None)
+        self.expires_at = timezone.now() + timedelta(days=1)
+        self.plain = ShortenedURL.objects.create(
+            original_url="https://example.com/ação", short_code="plain"
+        )
+        self.expiring = ShortenedURL.objects.create(
+            original_url="https://example.com/exp",
+            short_code="exp1",
+            expires_at=self.expires_at,
+            click_sample_rate=4,
+        )
+        self.capped = ShortenedURL.objects.create(
+            original_url="https://example.com/cap", short_code="cap", max_clicks=5
+        )
+
+    def test_loads_uncapped_links_in_compact_columns(self):
+        table = linktable.load_link_table()
+        self.assertEqual(len(table), 2)
+        self.assertGreater(table.nbytes(), 0)
+
+        entry = table.get("exp1")
+        self.assertEqual(entry["id"], self.expiring.pk)
+        self.assertEqual(entry["original_url"], "https://example.com/exp")
+        self.assertEqual(entry["expires_at"], self.expires_at)
+        self.assertEqual(entry["click_sample_rate"], 4)
+        self.assertTrue(entry["is_active"])
+        self.assertEqual(table.get("plain")["original_url"], "https://example.com/ação")
+        # Com teto (ou inexistente): fica para o cache.
+        self.assertIsNone(table.get("cap"))
+        self.assertIsNone(table.get("nope"))
+        self.assertIsNone(table.get("x" * 20))
+
+    def test_incremental_refresh_applies_updates(self):
+        table = linktable.load_link_table()
+        self.plain.original_url = "https://example.com/novo"
+        self.plain.save()
+        self.expiring.max_clicks = 3
+        self.expiring.save()
+        new = ShortenedURL.objects.create(original_url="https://example.com/n", short_code="new1")
+
+        # Uma leitura do registro de alterações e uma dos links alterados.
+        with self.assertNumQueries(2):
+            self.assertIs(linktable.refresh_link_table(), table)
+        self.assertEqual(table.get("plain")["original_url"], "https://example.com/novo")
+        self.assertIsNone(table.get("exp1"))
+        self.assertEqual(table.get("new1")["id"], new.pk)
+
+    @override_settings(LINK_TABLE_MAX_DELTA=1)
+    def test_rebuilds_when_delta_grows(self):
+        table = linktable.load_link_table()
+        self.plain.save()
+        self.expiring.save()
+        linktable.refresh_link_table()
+        self.assertGreater(table.delta_size, 1)
+        self.assertIsNot(linktable.refresh_link_table(), table)
+
+    def test_deleted_link_leaves_the_table(self):
+        table = linktable.load_link_table()
+        self.plain.delete()
+        linktable.refresh_link_table()
+        self.assertIsNone(table.get("plain"))
+        self.assertEqual(self.client.get("/api/r/plain/").status_code, 404)
+
+    def test_redirect_uses_table_without_reading_the_link(self):
+        linktable.load_link_table()
+        with self.assertNumQueries(0):
+            self.assertEqual(linktable.get_link_entry("plain")["id"], self.plain.pk)
+
+        response = self.client.get("/api/r/plain/")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], "https://example.com/a%C3%A7%C3%A3o")
+
+    def test_inactive_link_in_table_is_blocked(self):
+        self.plain.is_active = False
+        self.plain.save()
+        linktable.load_link_table()
+        response = self.client.get("/api/r/plain/")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(LINK_TABLE_ENABLED=False)
+    def test_disabled_table_is_never_loaded(self):
+        self.assertIsNone(linktable.get_link_entry("plain"))
+        self.assertIsNone(linktable.get_link_table())
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from shortener import metrics
+from shortener.models import ShortenedURL
+
+
+class MetricsRenderTest(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test_render_seconds", "Teste.", buckets=(0.1, 1.0))
+        self.addCleanup(metrics._registry.pop, "test_render_seconds")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = metrics.render()
+        self.assertIn('test_render_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_render_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('test_render_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("test_render_seconds_count 3", text)
+
+    def test_merges_process_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        counter = metrics.Counter("test_merge_total", "Teste.", labelnames=("kind",))
+        self.addCleanup(metrics._registry.pop, "test_merge_total")
+        counter.inc(kind="expired")
+
+        # Retrato de outro worker.
+        with open(os.path.join(directory, "metrics-999999.json"), "w") as file:
+            json.dump({"test_merge_total": [[["expired"], 4]]}, file)
+
+        with override_settings(METRICS_DIR=directory):
+            text = metrics.render()
+        self.assertIn('test_merge_total{kind="expired"} 5', text)
+        self.assertTrue(os.path.exists(os.path.join(directory, f"metrics-{os.getpid()}.json")))
+
+    def test_remove_process_file_drops_dead_worker(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name in ("metrics-999999.json", "metrics-999999.abc.tmp", "metrics-888888.json"):
+            with open(os.path.join(directory, name), "w") as file:
+                json.dump({}, file)
+
+        with override_settings(METRICS_DIR=directory):
+            metrics.remove_process_file(999999)
+            metrics.remove_process_file(777777)
+
+        self.assertEqual(os.listdir(directory), ["metrics-888888.json"])
+
+    def test_flush_failure_is_logged_not_raised(self):
+        with override_settings(METRICS_DIR="/nonexistent/metrics"):
+            with self.assertLogs("shortener.metrics", level="WARNING"):
+                self.assertFalse(metrics.flush())
+
+    def test_counters_do_not_write_inline(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with (
+            override_settings(METRICS_DIR=directory),
+            mock.patch.object(metrics, "_flusher", object()),
+            mock.patch.object(metrics, "flush") as flush,
+        ):
+            metrics.REDIRECT_CACHE.inc(result="hit")
+        flush.assert_not_called()
+
+
+@override_settings(METRICS_TOKEN="segredo")
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        ShortenedURL.objects.create(
+            original_url="https://example.com", short_code="metric", is_active=False
+        )
+
+    def test_redirect_metrics_are_exposed(self):
+        blocked = metrics.BLOCKED_RESPONSES.value(kind="inactive")
+        self.client.get("/api/r/metric/")
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer segredo")
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('shortener_request_duration_seconds_count{view="redirect"}', text)
+        self.assertIn('shortener_request_db_queries_bucket{view="redirect",le="+Inf"}', text)
+        self.assertIn('shortener_redirect_cache_total{result="miss"}', text)
+        self.assertEqual(metrics.BLOCKED_RESPONSES.value(kind="inactive"), blocked + 1)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_endpoint_is_disabled_without_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    def test_unwritable_metrics_dir_does_not_break_requests(self):
+        with (
+            override_settings(METRICS_DIR="/nonexistent/metrics"),
+            self.assertLogs("shortener.metrics", level="WARNING"),
+        ):
+            self.assertEqual(self.client.get("/api/r/metric/").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer segredo")
+        self.assertEqual(response.status_code, 200)
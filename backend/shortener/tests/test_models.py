@@ -3,7 +3,7 @@ from datetime import timedelta
 from django.test import TestCase
 from django.utils import timezone
 
-from shortener.models import Click, ShortenedURL
+from shortener.models import Click, Referer, ShortenedURL, UserAgent
 
 
 class ShortenedURLModelTest(TestCase):
@@ -83,6 +83,31 @@ class ShortenedURLModelTest(TestCase):
         self.assertFalse(can_access)
         self.assertIn("limite", message.lower())
 
+    def test_save_computes_state(self):
+        self.assertEqual(self.url.state, ShortenedURL.State.ACTIVE)
+        self.url.max_clicks = 5
+        self.url.unique_clicks = 5
+        self.url.save(update_fields=["max_clicks", "unique_clicks"])
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.state, ShortenedURL.State.EXHAUSTED)
+
+        self.url.is_active = False
+        self.url.save()
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.state, ShortenedURL.State.INACTIVE)
+
+    def test_reserve_unique_click_stops_at_cap(self):
+        self.url.max_clicks = 1
+        self.url.save()
+
+        self.assertTrue(ShortenedURL.reserve_unique_click(self.url.pk, self.url.short_code))
+        self.assertFalse(ShortenedURL.reserve_unique_click(self.url.pk, self.url.short_code))
+
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.unique_clicks, 1)
+        self.assertEqual(self.url.total_clicks, 1)
+        self.assertEqual(self.url.state, ShortenedURL.State.EXHAUSTED)
+
     def test_unique_short_code(self):
         from django.db import IntegrityError, transaction
 
@@ -114,6 +139,43 @@ class ClickModelTest(TestCase):
         self.assertEqual(self.click.referer, "https://google.com")
         self.assertIsNotNone(self.click.clicked_at)
 
+    def test_user_agent_and_referer_are_interned(self):
+        click2 = Click.objects.create(
+            url=self.url,
+            ip_address="192.168.1.2",
+            user_agent="Mozila/5.0",
+            referer="https://google.com",
+        )
+        self.assertEqual(click2.user_agent_ref_id, self.click.user_agent_ref_id)
+        self.assertEqual(click2.referer_ref_id, self.click.referer_ref_id)
+        self.assertEqual(UserAgent.objects.count(), 1)
+        self.assertEqual(Referer.objects.count(), 1)
+
+        reloaded = Click.objects.get(pk=click2.pk)
+        self.assertEqual(reloaded.user_agent, "Mozila/5.0")
+        self.assertEqual(reloaded.referer, "https://google.com")
+
+    def test_empty_user_agent_and_referer_are_not_interned(self):
+        click = Click.objects.create(url=self.url, ip_address="192.168.1.3", user_agent="")
+        self.assertIsNone(click.user_agent_ref_id)
+        self.assertIsNone(click.referer_ref_id)
+        reloaded = Click.objects.get(pk=click.pk)
+        self.assertEqual(reloaded.user_agent, "")
+        self.assertIsNone(reloaded.referer)
+
+    def test_ip_is_stored_packed(self):
+        self.assertEqual(bytes(self.click.ip), bytes([192, 168, 1, 1]))
+        self.assertEqual(bytes(self.click.ip_prefix), bytes([192, 168, 1]))
+
+        click = Click.objects.create(url=self.url, ip_address="2001:db8:1:2::7")
+        reloaded = Click.objects.get(pk=click.pk)
+        self.assertEqual(len(bytes(reloaded.ip)), 16)
+        self.assertEqual(reloaded.ip_address, "2001:db8:1:2::7")
+
+    def test_ipv4_mapped_ipv6_is_stored_as_ipv4(self):
+        click = Click.objects.create(url=self.url, ip_address="::ffff:192.168.1.1")
+        self.assertEqual(click.ip_address, "192.168.1.1")
+
     def test_str_method(self):
         result = str(self.click)
         self.assertIn("click123", result)
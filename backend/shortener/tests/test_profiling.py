@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from shortener.models import ShortenedURL
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        ShortenedURL.objects.create(original_url="https://example.com", short_code="prof")
+
+    def _settings(self, **overrides):
+        return override_settings(
+            PROFILING_ENABLED=True,
+            PROFILING_TOKEN="segredo",
+            PROFILING_DIR=self.directory,
+            **overrides,
+        )
+
+    def test_header_triggers_sampler_profile_and_sql_log(self):
+        with self._settings():
+            response = self.client.get("/api/urls/prof/", HTTP_X_PROFILE="segredo")
+
+        profile_id = response["X-Profile-Id"]
+        base = os.path.join(self.directory, profile_id)
+        self.assertTrue(os.path.exists(f"{base}.collapsed"))
+        with open(f"{base}.sql") as file:
+            sql = file.read()
+        self.assertIn("GET /api/urls/prof/ -> 200", sql)
+        self.assertIn("shortener_shortenedurl", sql)
+
+    def test_cprofile_mode(self):
+        with self._settings(PROFILING_MODE="cprofile"):
+            response = self.client.get("/api/urls/prof/", HTTP_X_PROFILE="segredo")
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, f"{response['X-Profile-Id']}.prof"))
+        )
+
+    def test_wrong_token_is_not_profiled(self):
+        with self._settings():
+            response = self.client.get("/api/urls/prof/", HTTP_X_PROFILE="outro")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sample_rate_profiles_without_header(self):
+        with self._settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get("/api/urls/prof/")
+        self.assertIn("X-Profile-Id", response)
+
+    def test_disabled_by_default(self):
+        response = self.client.get("/api/urls/prof/", HTTP_X_PROFILE="segredo")
+        self.assertNotIn("X-Profile-Id", response)
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shortener import routers
+from shortener.middleware import DatabasePinMiddleware
+from shortener.models import ShortenedURL
+
+
+@override_settings(DATABASE_REPLICA_MAX_LAG=5, DATABASE_REPLICA_LAG_CHECK_INTERVAL=60)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        routers._lag_cache.clear()
+        self.addCleanup(routers._lag_cache.clear)
+        patcher = mock.patch.object(
+            routers, "replica_aliases", return_value=["replica_1", "replica_2"]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = routers.ReplicaRouter()
+
+    def _read(self, lags):
+        with mock.patch.object(routers, "measure_lag", side_effect=lags.get):
+            return self.router.db_for_read(ShortenedURL)
+
+    def test_reads_go_to_replica_within_lag(self):
+        with routers.request_scope():
+            self.assertEqual(self._read({"replica_1": 0.5, "replica_2": 30}), "replica_1")
+
+    def test_reads_fall_back_to_primary_without_healthy_replica(self):
+        with routers.request_scope():
+            lags = {"replica_1": routers.UNAVAILABLE, "replica_2": 30}
+            self.assertEqual(self._read(lags), "default")
+
+    def test_reads_after_write_stay_on_primary(self):
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_write(ShortenedURL), "default")
+            self.assertEqual(self._read({"replica_1": 0, "replica_2": 0}), "default")
+        # O escopo seguinte (outra requisição) volta a usar as réplicas.
+        with routers.request_scope():
+            self.assertIn(self._read({"replica_1": 0, "replica_2": 0}), ["replica_1", "replica_2"])
+
+    def test_reads_inside_atomic_block_stay_on_primary(self):
+        default = connections["default"]
+        with routers.request_scope(), mock.patch.object(default, "in_atomic_block", True):
+            self.assertEqual(self._read({"replica_1": 0, "replica_2": 0}), "default")
+
+    def test_lag_is_measured_once_per_interval(self):
+        with routers.request_scope():
+            with mock.patch.object(routers, "measure_lag", return_value=0.0) as measure:
+                self.router.db_for_read(ShortenedURL)
+                self.router.db_for_read(ShortenedURL)
+        self.assertEqual(measure.call_count, 2)  # uma vez por réplica
+
+    def test_replicas_are_compared_against_primary_lsn(self):
+        with (
+            routers.request_scope(),
+            mock.patch.object(routers, "primary_lsn", return_value="0/16B3748") as lsn,
+            mock.patch.object(routers, "measure_lag", return_value=0.0) as measure,
+        ):
+            self.router.db_for_read(ShortenedURL)
+        lsn.assert_called_once_with()
+        measure.assert_has_calls(
+            [mock.call("replica_1", "0/16B3748"), mock.call("replica_2", "0/16B3748")]
+        )
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "shortener"))
+        self.assertFalse(self.router.allow_migrate("replica_1", "shortener"))
+
+
+@override_settings(DATABASE_REPLICA_URLS=["postgres://replica/db"], DATABASE_PIN_SECONDS=10)
+class DatabasePinMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def get_response(request):
+            self.seen.append(routers._pinned.get())
+            return HttpResponse(status=201 if request.method == "POST" else 200)
+
+        self.middleware = DatabasePinMiddleware(get_response)
+
+    def test_write_request_is_pinned_and_sets_cookie(self):
+        response = self.middleware(self.factory.post("/api/urls/"))
+        self.assertEqual(self.seen, [True])
+        self.assertEqual(response.cookies["db_pin"]["max-age"], 10)
+
+    def test_read_request_uses_replicas_unless_client_recently_wrote(self):
+        outside = routers._pinned.get()
+        response = self.middleware(self.factory.get("/api/urls/"))
+        self.assertNotIn("db_pin", response.cookies)
+
+        request = self.factory.get("/api/urls/")
+        request.COOKIES["db_pin"] = "1"
+        self.middleware(request)
+        self.assertEqual(self.seen, [False, True])
+        # O estado da requisição não vaza para o contexto de fora.
+        self.assertEqual(routers._pinned.get(), outside)
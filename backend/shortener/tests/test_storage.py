@@ -0,0 +1,52 @@
+import re
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from shortener.models import ShortenedURL
+from shortener.storage import content_addressed_name, qr_code_storage, save_qr_code
+
+QR_NAME = re.compile(r"^qrcodes/([0-9a-f]{2})/\1[0-9a-f]{62}\.png$")
+
+
+class QRCodeStorageTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix="qr-storage-")
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_saving_same_content_reuses_name(self):
+        first = save_qr_code(ContentFile(b"png-bytes"))
+        second = save_qr_code(ContentFile(b"png-bytes"))
+        other = save_qr_code(ContentFile(b"other-bytes"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, content_addressed_name(b"png-bytes"))
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, QR_NAME)
+        directory = first.rsplit("/", 1)[0]
+        self.assertEqual(len(qr_code_storage().listdir(directory)[1]), 1)
+
+    def test_created_link_points_to_content_addressed_qr_code(self):
+        response = self.client.post(
+            "/api/urls/", {"original_url": "https://github.com", "short_code": "qrhash"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+        url = ShortenedURL.objects.get(short_code="qrhash")
+        self.assertRegex(url.qr_code.name, QR_NAME)
+        self.assertTrue(qr_code_storage().exists(url.qr_code.name))
+        self.assertTrue(response.data["qr_code"].endswith(url.qr_code.name))
+
+    def test_each_link_gets_its_own_qr_code(self):
+        for code in ("qrone", "qrtwo"):
+            self.client.post(
+                "/api/urls/", {"original_url": "https://github.com", "short_code": code}
+            )
+        names = set(ShortenedURL.objects.values_list("qr_code", flat=True))
+        # A imagem codifica a URL curta: nenhum arquivo é compartilhado entre links.
+        self.assertEqual(len(names), 2)
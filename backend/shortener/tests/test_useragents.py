@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+
+from shortener.models import Click
+from shortener.useragents import classify_user_agent, user_agent_family
+
+
+class ClassifyUserAgentTest(SimpleTestCase):
+    def test_browser_is_human(self):
+        user_agent = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+        )
+        self.assertEqual(classify_user_agent(user_agent), Click.ClientClass.HUMAN)
+
+    def test_empty_user_agent_is_human(self):
+        self.assertEqual(classify_user_agent(""), Click.ClientClass.HUMAN)
+
+    def test_link_previews(self):
+        for user_agent in (
+            "WhatsApp/2.23.20.0",
+            "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
+            "Mozilla/5.0 (compatible; Discordbot/2.0; +https://discordapp.com)",
+        ):
+            self.assertEqual(classify_user_agent(user_agent), Click.ClientClass.PREVIEW)
+
+    def test_crawlers_and_monitors(self):
+        for user_agent in (
+            "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+            "Mozilla/5.0+(compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)",
+            "python-requests/2.32.3",
+            "Mozilla/5.0 (compatible;PetalBot;+https://webmaster.petalsearch.com/site/petalbot)",
+            "DuckDuckBot-Https/1.1; (+https://duckduckgo.com/duckduckbot)",
+        ):
+            self.assertEqual(classify_user_agent(user_agent), Click.ClientClass.BOT)
+
+    def test_bot_substring_in_device_name_is_human(self):
+        user_agent = (
+            "Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36"
+        )
+        self.assertEqual(classify_user_agent(user_agent), Click.ClientClass.HUMAN)
+
+
+class UserAgentFamilyTest(SimpleTestCase):
+    def test_families(self):
+        for user_agent, family in (
+            (
+                "Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 Chrome/126.0 Safari/537.36 "
+                "Edg/126.0",
+                "Edge",
+            ),
+            ("Mozilla/5.0 (X11; Linux) AppleWebKit/537.36 Chrome/126.0 Safari/537.36", "Chrome"),
+            ("Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0", "Firefox"),
+            (
+                "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+                "Version/17.5 Mobile/15E148 Safari/604.1",
+                "Safari",
+            ),
+            ("Mozilla/5.0 (compatible; Googlebot/2.1)", "Robo"),
+            ("", "Outro"),
+        ):
+            self.assertEqual(user_agent_family(user_agent), family)
@@ -1,17 +1,22 @@
 from datetime import timedelta
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from shortener.models import Click, ShortenedURL
+from shortener.cache import get_redirect_entry, redirect_cache_key, warm_redirect_cache
+from shortener.models import Click, ShortenedURL, Visitor
+from shortener.ratelimit import MemoryBackend
 
 
 class ShortenedURLViewSetTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.url1 = ShortenedURL.objects.create(
             original_url="https://example.com",
             short_code="test1",
@@ -34,6 +39,12 @@ class ShortenedURLViewSetTest(APITestCase):
         self.assertEqual(len(response.data["results"]), 1)  # type: ignore
         self.assertEqual(response.data["results"][0]["short_code"], "test1")  # type: ignore
 
+    def test_list_urls_filter_state(self):
+        response = self.client.get(self.list_url, {"state": "inactive"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)  # type: ignore
+        self.assertEqual(response.data["results"][0]["short_code"], "test2")  # type: ignore
+
     def test_list_urls_search(self):
         response = self.client.get(self.list_url, {"search": "google"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -123,6 +134,10 @@ class ShortenedURLViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("total_clicks", response.data)  # type: ignore
         self.assertIn("recent_clicks", response.data)  # type: ignore
+        self.assertEqual(
+            response.data["top_ip_prefixes"],  # type: ignore
+            [{"prefix": "192.168.1.0/24", "clicks": 2}],
+        )
 
     def test_qrcode_endpoint(self):
         url = f"/api/urls/{self.url1.short_code}/qrcode/"
@@ -172,6 +187,23 @@ class RedirectViewTest(TestCase):
         self.url.refresh_from_db()
         self.assertEqual(self.url.unique_clicks, unique_after_first)
 
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_redirect_behind_proxy_uses_forwarded_for(self):
+        # Todos chegam pelo mesmo proxy; só o X-Forwarded-For distingue os clientes.
+        for client_ip in ("203.0.113.1", "203.0.113.2"):
+            self.client.get(
+                f"/api/r/{self.url.short_code}/",
+                REMOTE_ADDR="172.18.0.5",
+                HTTP_X_FORWARDED_FOR=client_ip,
+            )
+
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.unique_clicks, 2)
+        self.assertEqual(
+            sorted(click.ip_address for click in Click.objects.filter(url=self.url)),
+            ["203.0.113.1", "203.0.113.2"],
+        )
+
     def test_redirect_inactive_url(self):
         self.url.is_active = False
         self.url.save()
@@ -191,6 +223,55 @@ class RedirectViewTest(TestCase):
         response = self.client.get(f"/api/r/{self.url.short_code}/")
         self.assertEqual(response.status_code, 403)
 
+    def test_redirect_reaching_max_clicks_marks_exhausted(self):
+        self.url.max_clicks = 1
+        self.url.save()
+        self.client.get(f"/api/r/{self.url.short_code}/", REMOTE_ADDR="192.168.1.100")
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.state, ShortenedURL.State.EXHAUSTED)
+
+        response = self.client.get(f"/api/r/{self.url.short_code}/", REMOTE_ADDR="192.168.1.101")
+        self.assertEqual(response.status_code, 403)
+
+    def test_redirect_max_clicks_enforced_with_stale_cache(self):
+        self.url.max_clicks = 1
+        self.url.save()
+        get_redirect_entry(self.url.short_code)
+        # Outro worker consumiu a ultima vaga sem que este cache soubesse.
+        ShortenedURL.objects.filter(pk=self.url.pk).update(unique_clicks=1)
+
+        response = self.client.get(f"/api/r/{self.url.short_code}/", REMOTE_ADDR="192.168.1.101")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Click.objects.filter(url=self.url).exists())
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.unique_clicks, 1)
+        # Sem vaga, o IP não fica registrado como visitante.
+        self.assertFalse(Visitor.objects.filter(url=self.url).exists())
+
+    def test_concurrent_first_visits_count_once(self):
+        self.client.get(f"/api/r/{self.url.short_code}/", REMOTE_ADDR="192.168.1.100")
+        # A segunda requisição consultou Visitor antes de a primeira inserir a linha.
+        lookup = mock.Mock()
+        lookup.return_value.exists.return_value = False
+        with mock.patch.object(Visitor.objects, "filter", lookup):
+            response = self.client.get(
+                f"/api/r/{self.url.short_code}/", REMOTE_ADDR="192.168.1.100"
+            )
+
+        self.assertEqual(response.status_code, 302)
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.unique_clicks, 1)
+        self.assertEqual(self.url.total_clicks, 2)
+        self.assertEqual(Visitor.objects.filter(url=self.url).count(), 1)
+
+    def test_redirect_sees_deactivation(self):
+        self.client.get(f"/api/r/{self.url.short_code}/")
+        self.url.is_active = False
+        self.url.save()
+        response = self.client.get(f"/api/r/{self.url.short_code}/")
+        self.assertEqual(response.status_code, 403)
+
     def test_redirect_not_found(self):
         response = self.client.get("/api/r/notfound/")
         self.assertEqual(response.status_code, 404)
@@ -204,3 +285,265 @@ class RedirectViewTest(TestCase):
         self.client.get(f"/api/r/{self.url.short_code}/", HTTP_REFERER="https://google.com")
         click = Click.objects.latest("clicked_at")
         self.assertEqual(click.referer, "https://google.com")
+
+    def test_blocked_json_body(self):
+        self.url.is_active = False
+        self.url.save()
+        response = self.client.get(f"/api/r/{self.url.short_code}/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            response.json(), {"error": "Link inativo", "short_code": self.url.short_code}
+        )
+
+    def test_blocked_html_fills_dynamic_fields(self):
+        self.url.max_clicks = 2
+        self.url.unique_clicks = 2
+        self.url.save()
+        response = self.client.get(f"/api/r/{self.url.short_code}/", HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, 403)
+        self.assertContains(response, "Limite de cliques atingido", status_code=403)
+        self.assertContains(response, "2 / 2", status_code=403)
+        self.assertNotContains(response, "@@", status_code=403)
+        self.assertNotContains(response, self.url.original_url, status_code=403)
+
+    def test_blocked_html_escapes_short_code(self):
+        response = self.client.get("/api/r/%3Cb%3Ex/", HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, 404)
+        self.assertContains(response, "&lt;b&gt;x", status_code=404)
+
+    def test_blocked_response_cache_headers(self):
+        response = self.client.get("/api/r/notfound/")
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertIn("Accept", response["Vary"])
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="limited",
+        )
+
+    @override_settings(RATE_LIMITS={"redirect": "2/m"})
+    def test_redirect_over_limit_returns_429_without_click(self):
+        for _ in range(2):
+            response = self.client.get("/api/r/limited/", REMOTE_ADDR="10.9.0.1")
+            self.assertEqual(response.status_code, 302)
+
+        response = self.client.get("/api/r/limited/", REMOTE_ADDR="10.9.0.1")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(Click.objects.filter(url=self.url).count(), 2)
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.total_clicks, 2)
+
+    @override_settings(RATE_LIMITS={"redirect": "1/m"})
+    def test_limit_is_per_client(self):
+        self.client.get("/api/r/limited/", REMOTE_ADDR="10.9.0.2")
+        response = self.client.get("/api/r/limited/", REMOTE_ADDR="10.9.0.3")
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(RATE_LIMITS={"redirect": "1/m"})
+    def test_forwarded_for_is_ignored_without_trusted_proxy(self):
+        self.client.get("/api/r/limited/", REMOTE_ADDR="10.9.0.5", HTTP_X_FORWARDED_FOR="1.1.1.1")
+        response = self.client.get(
+            "/api/r/limited/", REMOTE_ADDR="10.9.0.5", HTTP_X_FORWARDED_FOR="2.2.2.2"
+        )
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(RATE_LIMITS={"redirect": "1/m"}, TRUSTED_PROXY_COUNT=1)
+    def test_forwarded_for_uses_address_seen_by_trusted_proxy(self):
+        self.client.get("/api/r/limited/", HTTP_X_FORWARDED_FOR="1.1.1.1, 10.9.0.6")
+        # O primeiro valor vem do cliente; o último foi acrescentado pelo proxy.
+        response = self.client.get("/api/r/limited/", HTTP_X_FORWARDED_FOR="2.2.2.2, 10.9.0.6")
+        self.assertEqual(response.status_code, 429)
+        response = self.client.get("/api/r/limited/", HTTP_X_FORWARDED_FOR="10.9.0.7")
+        self.assertEqual(response.status_code, 302)
+
+    def test_memory_backend_evicts_least_recently_used(self):
+        backend = MemoryBackend()
+        backend.max_keys = 2
+        backend.incr("a", ttl=60)
+        backend.incr("b", ttl=60)
+        backend.incr("a", ttl=60)
+        backend.incr("c", ttl=60)
+        self.assertEqual(len(backend._counters), 2)
+        self.assertEqual(backend.get("a"), 2)
+        self.assertEqual(backend.get("b"), 0)
+
+    @override_settings(RATE_LIMITS={"create": "1/m"}, RATE_LIMIT_BACKEND="cache")
+    def test_create_over_limit_with_cache_backend(self):
+        data = {"original_url": "https://github.com"}
+        response = self.client.post("/api/urls/", data, REMOTE_ADDR="10.9.0.4")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post("/api/urls/", data, REMOTE_ADDR="10.9.0.4")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+class BotClickTest(TestCase):
+    def setUp(self):
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="bots",
+        )
+
+    def test_preview_bot_is_counted_separately(self):
+        response = self.client.get(
+            "/api/r/bots/", HTTP_USER_AGENT="Slackbot-LinkExpanding 1.0 (+https://api.slack.com/)"
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Click.objects.filter(url=self.url).exists())
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.bot_clicks, 1)
+        self.assertEqual(self.url.total_clicks, 0)
+        self.assertEqual(self.url.unique_clicks, 0)
+
+    @override_settings(BOT_CLICK_SAMPLE_RATE=1)
+    def test_sampled_bot_click_is_stored_with_class(self):
+        self.client.get("/api/r/bots/", HTTP_USER_AGENT="curl/8.4.0")
+        click = Click.objects.get(url=self.url)
+        self.assertEqual(click.client_class, Click.ClientClass.BOT)
+
+    def test_statistics_filters_by_client_class(self):
+        Click.objects.create(url=self.url, ip_address="10.0.0.1")
+        Click.objects.create(
+            url=self.url, ip_address="10.0.0.2", client_class=Click.ClientClass.PREVIEW
+        )
+        response = self.client.get("/api/urls/bots/statistics/", {"client_class": "preview"})
+        self.assertEqual(len(response.data["recent_clicks"]), 1)  # type: ignore
+        self.assertEqual(response.data["recent_clicks"][0]["ip_address"], "10.0.0.2")  # type: ignore
+        self.assertIn("bot_clicks", response.data)  # type: ignore
+
+
+class ClickSamplingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com",
+            short_code="sampled",
+            click_sample_rate=10,
+        )
+
+    def _visit(self):
+        return self.client.get("/api/r/sampled/", REMOTE_ADDR="10.8.0.1")
+
+    def test_first_click_is_always_stored(self):
+        with mock.patch("shortener.views.random.randrange", return_value=5):
+            self._visit()
+        click = Click.objects.get(url=self.url)
+        self.assertEqual(click.weight, 1)
+
+    def test_repeat_clicks_are_sampled_with_weight(self):
+        self._visit()
+        with mock.patch("shortener.views.random.randrange", return_value=5):
+            self._visit()
+        with mock.patch("shortener.views.random.randrange", return_value=0):
+            self._visit()
+
+        self.assertEqual(
+            list(Click.objects.filter(url=self.url).values_list("weight", flat=True)), [10, 1]
+        )
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.total_clicks, 3)
+        self.assertEqual(self.url.unique_clicks, 1)
+
+    def test_statistics_scale_prefixes_by_weight(self):
+        Click.objects.create(url=self.url, ip_address="10.8.0.1")
+        Click.objects.create(url=self.url, ip_address="10.8.0.1", weight=10)
+        response = self.client.get("/api/urls/sampled/statistics/")
+        self.assertEqual(
+            response.data["top_ip_prefixes"], [{"prefix": "10.8.0.0/24", "clicks": 11}]  # type: ignore
+        )
+
+
+class AnalyticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = ShortenedURL.objects.create(
+            original_url="https://example.com", short_code="stats"
+        )
+        chrome = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/126.0 Safari/537.36"
+        firefox = "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+        Click.objects.create(
+            url=self.url,
+            ip_address="10.0.0.1",
+            user_agent=chrome,
+            referer="https://www.google.com/",
+        )
+        Click.objects.create(
+            url=self.url,
+            ip_address="10.0.0.2",
+            user_agent=chrome,
+            referer="https://google.com/search?q=x",
+            weight=5,
+        )
+        Click.objects.create(url=self.url, ip_address="10.0.1.1", user_agent=firefox)
+
+    def test_analytics_groups_by_domain_family_and_hour(self):
+        response = self.client.get("/api/urls/stats/analytics/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            data["top_referers"],
+            [{"domain": "google.com", "clicks": 6}, {"domain": None, "clicks": 1}],
+        )
+        self.assertEqual(
+            data["top_browsers"],
+            [{"family": "Chrome", "clicks": 6}, {"family": "Firefox", "clicks": 1}],
+        )
+        self.assertEqual(data["top_countries"], [{"country": None, "clicks": 7}])
+        self.assertEqual(len(data["hourly"]), 24)
+        self.assertEqual(sum(row["clicks"] for row in data["hourly"]), 7)
+
+    def test_analytics_is_cached_per_link(self):
+        self.client.get("/api/urls/stats/analytics/")
+        Click.objects.create(url=self.url, ip_address="10.0.0.9")
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/urls/stats/analytics/")
+        self.assertEqual(sum(row["clicks"] for row in response.json()["hourly"]), 7)
+
+    def test_analytics_rejects_invalid_top(self):
+        response = self.client.get("/api/urls/stats/analytics/", {"top": "500"})
+        self.assertEqual(response.status_code, 400)
+
+
+class WarmRedirectCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for index, clicks in enumerate([5, 50, 0, 20]):
+            ShortenedURL.objects.create(
+                original_url=f"https://example.com/{index}",
+                short_code=f"warm{index}",
+                total_clicks=clicks,
+            )
+        ShortenedURL.objects.create(
+            original_url="https://example.com/off",
+            short_code="warmoff",
+            total_clicks=999,
+            is_active=False,
+        )
+
+    def test_loads_most_clicked_active_links_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(warm_redirect_cache(limit=2, budget=5), 2)
+        self.assertIsNotNone(cache.get(redirect_cache_key("warm1")))
+        self.assertIsNotNone(cache.get(redirect_cache_key("warm3")))
+        self.assertIsNone(cache.get(redirect_cache_key("warm0")))
+        self.assertIsNone(cache.get(redirect_cache_key("warmoff")))
+
+        # O redirecionamento do link aquecido não consulta o link no banco.
+        with self.assertNumQueries(0):
+            entry = get_redirect_entry("warm1")
+        self.assertEqual(entry["original_url"], "https://example.com/1")
+
+    def test_stops_at_budget_between_batches(self):
+        with mock.patch("shortener.cache.WARM_BATCH_SIZE", 2):
+            self.assertEqual(warm_redirect_cache(limit=10, budget=0), 2)
+
+    @override_settings(REDIRECT_CACHE_WARM_SIZE=0)
+    def test_size_zero_disables_warming(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(warm_redirect_cache(), 0)
@@ -0,0 +1,96 @@
+"""
+Classificação de user agents dos cliques.
+
+Separa pessoas de robôs de pré-visualização de link (Slack, WhatsApp,
+Facebook...) e de robôs em geral (crawlers, monitores, clientes HTTP). As
+expressões são compiladas uma vez e o resultado fica num LRU, já que poucos
+user agents distintos respondem pela maior parte do tráfego.
+
+user_agent_family() dá a família do navegador usada nas análises; ela é
+calculada uma vez por user agent distinto, na hora da internação.
+"""
+
+import re
+from functools import lru_cache
+
+from .models import Click
+
+PREVIEW_PATTERNS = (
+    "slackbot",
+    "slack-imgproxy",
+    "whatsapp",
+    "facebookexternalhit",
+    "facebookcatalog",
+    "twitterbot",
+    "linkedinbot",
+    "telegrambot",
+    "discordbot",
+    "skypeuripreview",
+    "microsoftpreview",
+    "pinterestbot",
+    "redditbot",
+    "embedly",
+    "iframely",
+    "vkshare",
+)
+
+# "bot" só como palavra ou no fim de um token de produto ("Googlebot/2.1",
+# "PetalBot;", "DuckDuckBot-Https"): nomes de aparelho como "CUBOT X30" são pessoas.
+BOT_TOKEN = r"bot[/;-]|\bbot\b"
+
+BOT_PATTERNS = (
+    "crawl",
+    "spider",
+    "slurp",
+    "monitor",
+    "pingdom",
+    "statuscake",
+    "headlesschrome",
+    "lighthouse",
+    "curl/",
+    "wget/",
+    "python-requests",
+    "python-urllib",
+    "aiohttp",
+    "go-http-client",
+    "okhttp",
+    "java/",
+    "libwww",
+    "scrapy",
+)
+
+_PREVIEW_RE = re.compile("|".join(map(re.escape, PREVIEW_PATTERNS)), re.IGNORECASE)
+_BOT_RE = re.compile("|".join((BOT_TOKEN, *map(re.escape, BOT_PATTERNS))), re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(user_agent):
+    """Retorna o Click.ClientClass do user agent (string vazia conta como pessoa)."""
+    if _PREVIEW_RE.search(user_agent):
+        return Click.ClientClass.PREVIEW
+    if _BOT_RE.search(user_agent):
+        return Click.ClientClass.BOT
+    return Click.ClientClass.HUMAN
+
+
+# Ordem importa: Edge e Opera também se anunciam como Chrome, e Chrome como Safari.
+FAMILY_PATTERNS = (
+    ("Edge", r"Edg(e|A|iOS)?/"),
+    ("Opera", r"OPR/|Opera"),
+    ("Samsung Internet", r"SamsungBrowser/"),
+    ("Chrome", r"Chrome/|CriOS/"),
+    ("Firefox", r"Firefox/|FxiOS/"),
+    ("Safari", r"Safari/"),
+)
+
+_FAMILY_RES = tuple((family, re.compile(pattern)) for family, pattern in FAMILY_PATTERNS)
+
+
+def user_agent_family(user_agent):
+    """Família do navegador ("Chrome", "Firefox"...), "Robo" ou "Outro"."""
+    if classify_user_agent(user_agent) != Click.ClientClass.HUMAN:
+        return "Robo"
+    for family, pattern in _FAMILY_RES:
+        if pattern.search(user_agent):
+            return family
+    return "Outro"
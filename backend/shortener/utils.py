@@ -1,17 +1,22 @@
 """
 Funções auxiliares para aplicativos de encurtamento de URLs.
 
-Este módulo fornece funções auxiliares para geração de código QR e extração de IP.
+Este módulo fornece funções auxiliares para geração de código QR, extração de IP
+e a representação binária compacta de endereços IP usada em Click.
 
 """
 
+import ipaddress
 import random
 import string
+import time
 from io import BytesIO
+from urllib.parse import urlsplit
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 
-import qrcode
+from .metrics import QR_RENDER_SECONDS
 
 
 def generate_short_code(length=6):
@@ -20,6 +25,11 @@ def generate_short_code(length=6):
 
 
 def generate_qr_code(url, short_code):
+    # Import tardio: qrcode e Pillow custam dezenas de ms e vários MB por processo,
+    # e só a criação de links (nunca o redirecionamento) gera QR Codes.
+    import qrcode
+
+    start = time.perf_counter()
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,  # type: ignore
@@ -36,13 +46,64 @@ def generate_qr_code(url, short_code):
     img.save(buffer, format="PNG")  # type: ignore
     buffer.seek(0)
 
+    QR_RENDER_SECONDS.observe(time.perf_counter() - start)
     return ContentFile(buffer.read(), name=f"{short_code}.png")
 
 
 def get_client_ip(request):
+    """
+    IP do cliente. O X-Forwarded-For só vale atrás de TRUSTED_PROXY_COUNT
+    proxies confiáveis: cada um acrescenta o endereço que viu no fim da lista,
+    então o cliente é a N-ésima entrada a partir do fim. O que vem antes dela
+    foi enviado pelo próprio cliente e é ignorado.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
     x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(",")[0]
-    else:
-        ip = request.META.get("REMOTE_ADDR")
-    return ip
+    if proxies > 0 and x_forwarded_for:
+        entries = [entry.strip() for entry in x_forwarded_for.split(",")]
+        ip = entries[-min(proxies, len(entries))]
+        try:
+            ipaddress.ip_address(ip)
+            return ip
+        except ValueError:
+            pass
+    return request.META.get("REMOTE_ADDR")
+
+
+def referer_domain(referer):
+    """Host da URL de referência, sem "www." (vazio se não houver host)."""
+    try:
+        host = urlsplit(referer).hostname or ""
+    except ValueError:
+        return ""
+    return host.removeprefix("www.")[:255]
+
+
+def pack_ip(ip):
+    """
+    Converte o IP textual em bytes: 4 para IPv4, 16 para IPv6.
+
+    IPv6 com IPv4 mapeado (::ffff:a.b.c.d) vira o IPv4, para o mesmo visitante
+    não aparecer com duas chaves diferentes.
+    """
+    address = ipaddress.ip_address(ip)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.packed
+
+
+def unpack_ip(packed):
+    return str(ipaddress.ip_address(bytes(packed)))
+
+
+def ip_prefix(packed):
+    """Prefixo de agregação: /24 (3 bytes) para IPv4, /48 (6 bytes) para IPv6."""
+    packed = bytes(packed)
+    return packed[:3] if len(packed) == 4 else packed[:6]
+
+
+def format_ip_prefix(prefix):
+    prefix = bytes(prefix)
+    if len(prefix) == 3:
+        return f"{ipaddress.IPv4Address(prefix + bytes(1))}/24"
+    return f"{ipaddress.IPv6Address(prefix + bytes(10))}/48"
@@ -4,18 +4,40 @@ APIs de visualização para aplicativos de encurtamento de URLs.
 Este módulo contém ViewSets e visualizações para gerenciar URLs encurtadas, lidar com redirecionamentos e rastrear cliques.
 """
 
-from django.core.exceptions import ObjectDoesNotExist
+import json
+import random
+import re
+from datetime import datetime, time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import F, Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.utils import dateformat, timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
+from django.utils.html import escape
 from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 
-from .models import Click, ShortenedURL
+from .analytics import get_link_analytics, get_top_ip_prefixes
+from .archive import count_clicks_in_range
+from .cache import get_redirect_entry, purge_redirect_cache
+from .changes import POLL_LIMIT, poll_link_changes
+from .linktable import get_link_entry
+from .metrics import BLOCKED_RESPONSES
+from .metrics import render as render_metrics
+from .models import Click, ShortenedURL, Visitor
+from .ratelimit import check_rate_limit, rate_limited_response
+from .routers import pin_to_primary
 from .serializers import (
     ClickSerializer,
     ShortenedURLCreateSerializer,
@@ -23,7 +45,9 @@ from .serializers import (
     ShortenedURLListSerializer,
     ShortenedURLUpdateSerializer,
 )
-from .utils import generate_qr_code, get_client_ip
+from .storage import save_qr_code
+from .useragents import classify_user_agent
+from .utils import generate_qr_code, get_client_ip, pack_ip
 
 
 class ShortenedURLViewSet(viewsets.ModelViewSet):
@@ -34,6 +58,7 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
 
     Endpoints:
         - GET /api/urls/ - Listar todos os URLs (com paginação, pesquisa e filtros)
+          (filtros: is_active, state, search)
         - POST /api/urls/ - Criar um novo URL encurtado
         - GET /api/urls/{short_code}/ - Recuperar detalhes do URL
         - PATCH /api/urls/{short_code}/ - Atualizar URL
@@ -41,6 +66,10 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
         - POST /api/urls/{short_code}/activate/ - Ativar URL
         - POST /api/urls/{short_code}/deactivate/ - Desativar URL
         - GET /api/urls/{short_code}/statistics/ - Obter estatísticas do URL
+          (?client_class=human|preview|bot filtra os cliques recentes;
+          ?since=&until= conta os cliques do período, inclusive os arquivados)
+        - GET /api/urls/{short_code}/analytics/ - Agregados por referência, navegador e hora
+          (?top=N, até 50; ?client_class=human|preview|bot)
         - GET /api/urls/{short_code}/qrcode/ - Obter código QR
     """
 
@@ -63,6 +92,10 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == "true")
 
+        state = self.request.query_params.get("state")  # type: ignore
+        if state in ShortenedURL.State.values:
+            queryset = queryset.filter(state=state)
+
         search = self.request.query_params.get("search")  # type: ignore
         if search:
             queryset = queryset.filter(
@@ -72,13 +105,18 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
         return queryset.order_by("-created_at")
 
     def create(self, request, *args, **kwargs):
+        retry_after = check_rate_limit("create", request)
+        if retry_after:
+            return rate_limited_response(retry_after)
+
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         instance = serializer.save()
 
         short_url = request.build_absolute_uri(f"/api/r/{instance.short_code}")
         qr_code_file = generate_qr_code(short_url, instance.short_code)
-        instance.qr_code.save(f"{instance.short_code}.png", qr_code_file, save=True)
+        instance.qr_code.name = save_qr_code(qr_code_file)
+        instance.save(update_fields=["qr_code"])
 
         detail_serializer = ShortenedURLDetailSerializer(instance, context={"request": request})
         headers = self.get_success_headers(detail_serializer.data)
@@ -126,26 +164,68 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
     def statistics(self, request, short_code=None):
         url = self.get_object()
 
-        recent_clicks = url.clicks.all()[:20]
+        recent_clicks = url.clicks.select_related("user_agent_ref", "referer_ref")
+        client_class = request.query_params.get("client_class")
+        if client_class in Click.ClientClass.values:
+            recent_clicks = recent_clicks.filter(client_class=client_class)
+        recent_clicks = recent_clicks[:20]
 
         from .serializers import ClickSerializer
 
+        since = _parse_range_param(request.query_params.get("since"))
+        until = _parse_range_param(request.query_params.get("until"))
+        if since is False or until is False:
+            return Response(
+                {"error": "since/until devem estar no formato ISO 8601 (AAAA-MM-DD[THH:MM])"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         data = {
             "short_code": url.short_code,
             "original_url": url.original_url,
             "is_active": url.is_active,
             "total_clicks": url.total_clicks,
             "unique_clicks": url.unique_clicks,
+            "bot_clicks": url.bot_clicks,
             "is_expired": url.is_expired(),
             "has_reached_max_clicks": url.has_reached_max_clicks(),
             "expires_at": url.expires_at,
             "max_clicks": url.max_clicks,
+            "click_sample_rate": url.click_sample_rate,
             "created_at": url.created_at,
             "recent_clicks": ClickSerializer(recent_clicks, many=True).data,
+            "top_ip_prefixes": get_top_ip_prefixes(url),
         }
 
+        if since or until:
+            data["clicks_in_range"] = {
+                "since": since,
+                "until": until,
+                "clicks": count_clicks_in_range(url, since, until),
+            }
+
         return Response(data)
 
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, short_code=None):
+        url = self.get_object()
+
+        try:
+            top = int(request.query_params.get("top", 10))
+        except ValueError:
+            top = 0
+        if not 1 <= top <= 50:
+            return Response(
+                {"error": "top deve ser um inteiro entre 1 e 50"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        client_class = request.query_params.get("client_class")
+        if client_class not in Click.ClientClass.values:
+            client_class = None
+
+        return Response(get_link_analytics(url, top, client_class))
+
     @action(detail=True, methods=["get"])
     def qrcode(self, request, short_code=None):
         url = self.get_object()
@@ -163,6 +243,24 @@ class ShortenedURLViewSet(viewsets.ModelViewSet):
         )
 
 
+def _parse_range_param(value):
+    """Data ou data/hora ISO; None se ausente e False se inválida."""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return False
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        return False
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 # Cópia das quatro páginas públicas de bloqueio (1g). O destino nunca aparece.
 BLOCKED_PAGES = {
     "inactive": {
@@ -203,40 +301,126 @@ def _wants_html(request):
     return "text/html" in request.headers.get("Accept", "")
 
 
-def _blocked_response(request, kind, short_code, http_status, url=None):
-    """
-    Resposta de bloqueio com o status HTTP real — nunca 200 com página de erro.
-    O template só recebe dado público: nada de original_url.
-    """
+# Dados da requisicao que variam dentro de uma mesma pagina de bloqueio. O
+# template e renderizado uma unica vez com marcadores no lugar deles.
+_BLOCKED_PLACEHOLDERS = ("short_code", "home_url", "expires_at", "unique_clicks", "max_clicks")
+_BLOCKED_PLACEHOLDER_RE = re.compile(r"@@(%s)@@" % "|".join(_BLOCKED_PLACEHOLDERS))
+
+# Corpo JSON pre-codificado ate o short_code, o unico trecho dinamico.
+_BLOCKED_JSON_PREFIX = {
+    kind: '{"error": %s, "short_code": ' % json.dumps(page["title"])
+    for kind, page in BLOCKED_PAGES.items()
+}
+
+
+@lru_cache(maxsize=None)
+def _blocked_page_html(kind, http_status):
+    """Renderiza o template uma vez por processo para cada variante de bloqueio."""
     context = {
         **BLOCKED_PAGES[kind],
         "kind": kind,
         "http_status": http_status,
-        "short_code": short_code,
-        "home_url": request.build_absolute_uri("/"),
+        **{name: f"@@{name}@@" for name in _BLOCKED_PLACEHOLDERS},
     }
+    return render_to_string("shortener/blocked.html", context)
 
-    if url is not None:
-        context["expires_at"] = url.expires_at
-        context["unique_clicks"] = url.unique_clicks
-        context["max_clicks"] = url.max_clicks
 
+def _blocked_response(request, kind, short_code, http_status, url=None):
+    """
+    Resposta de bloqueio com o status HTTP real — nunca 200 com página de erro.
+    O template só recebe dado público: nada de original_url.
+    """
+    BLOCKED_RESPONSES.inc(kind=kind)
     if _wants_html(request):
-        return render(request, "shortener/blocked.html", context, status=http_status)
+        values = {
+            "short_code": short_code,
+            "home_url": request.build_absolute_uri("/"),
+            "expires_at": "",
+            "unique_clicks": "",
+            "max_clicks": "",
+        }
+        if url is not None:
+            if url.expires_at:
+                values["expires_at"] = dateformat.format(
+                    timezone.localtime(url.expires_at), "d/m/Y · H:i"
+                )
+            values["unique_clicks"] = url.unique_clicks
+            values["max_clicks"] = url.max_clicks
+
+        html = _BLOCKED_PLACEHOLDER_RE.sub(
+            lambda match: escape(values[match.group(1)]),
+            _blocked_page_html(kind, http_status),
+        )
+        response = HttpResponse(html, status=http_status)
+    else:
+        response = HttpResponse(
+            _BLOCKED_JSON_PREFIX[kind] + json.dumps(short_code) + "}",
+            content_type="application/json",
+            status=http_status,
+        )
+
+    # O estado do link pode mudar (reativacao, novo codigo), entao o cache e curto.
+    patch_cache_control(response, public=True, max_age=settings.BLOCKED_PAGE_MAX_AGE)
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def metrics_view(request):
+    """Métricas no formato do Prometheus; exige "Bearer <METRICS_TOKEN>" (sem token, 404)."""
+    token = settings.METRICS_TOKEN
+    if not settings.METRICS_ENABLED or not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_view(["GET"])
+def link_changes(request):
+    """
+    Registro de alterações de links a partir de um cursor.
+
+    GET /api/changes/?after=<seq>&limit=<1-1000> devolve as alterações com seq
+    maior que `after` e `next`, o cursor da próxima chamada.
+    """
+    try:
+        after = int(request.query_params.get("after", 0))
+        limit = int(request.query_params.get("limit", POLL_LIMIT))
+    except ValueError:
+        after = limit = -1
+    if after < 0 or not 1 <= limit <= POLL_LIMIT:
+        return Response(
+            {"detail": f"after deve ser >= 0 e limit entre 1 e {POLL_LIMIT}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    changes, cursor = poll_link_changes(after, limit)
+    return Response({"changes": changes, "next": cursor})
 
-    return JsonResponse(
-        {"error": context["title"], "short_code": short_code},
-        status=http_status,
-    )
+
+def _sample_weight(rate):
+    """
+    Amostragem 1 a cada rate: devolve o peso do clique gravado (rate) ou 0
+    quando este clique não deve virar linha. rate 0 não grava nenhum.
+    """
+    if rate < 1:
+        return 0
+    return rate if random.randrange(rate) == 0 else 0
 
 
 @csrf_exempt
 def redirect_shortened_url(request, short_code):
-    try:
-        url = ShortenedURL.objects.get(short_code=short_code)
-    except ObjectDoesNotExist:
+    # Antes de qualquer consulta: cliente acima do limite não gera escrita nenhuma.
+    retry_after = check_rate_limit("redirect", request)
+    if retry_after:
+        return rate_limited_response(retry_after)
+
+    # Links sem teto saem da tabela em memória (se ligada); os demais, do cache.
+    entry = get_link_entry(short_code) or get_redirect_entry(short_code)
+    if entry is None:
         return _blocked_response(request, "not_found", short_code, 404)
 
+    # Instancia nao salva: so carrega os campos do cache para reaproveitar as regras do modelo.
+    url = ShortenedURL(**entry)
     can_access, _message = url.can_be_accessed()
 
     if not can_access:
@@ -253,15 +437,73 @@ def redirect_shortened_url(request, short_code):
     user_agent = request.META.get("HTTP_USER_AGENT", "")
     referer = request.META.get("HTTP_REFERER", "")
 
-    is_unique = not Click.objects.filter(url=url, ip_address=ip_address).exists()
+    client_class = classify_user_agent(user_agent)
+    if client_class != Click.ClientClass.HUMAN:
+        # Robôs e prévias não contam nos cliques nem consomem o teto; só uma
+        # amostra (1 a cada BOT_CLICK_SAMPLE_RATE) vira linha de Click.
+        ShortenedURL.objects.filter(pk=url.pk).update(
+            bot_clicks=F("bot_clicks") + 1, updated_at=timezone.now()
+        )
+        weight = _sample_weight(settings.BOT_CLICK_SAMPLE_RATE)
+        if weight:
+            Click.objects.create(
+                url_id=url.pk,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                referer=referer,
+                client_class=client_class,
+                weight=weight,
+            )
+        return redirect(url.original_url)
 
-    Click.objects.create(url=url, ip_address=ip_address, user_agent=user_agent, referer=referer)
+    # A unicidade decide o que será gravado: com réplica atrasada, a visita
+    # anterior deste IP poderia não aparecer ainda. Vem de Visitor, e não de
+    # Click, porque cliques antigos são arquivados (shortener.archive).
+    pin_to_primary()
+    packed_ip = pack_ip(ip_address)
+    is_unique = not Visitor.objects.filter(url_id=url.pk, ip=packed_ip).exists()
 
     if is_unique:
+        # O exists() acima só poupa as repetições; quem decide é a inserção em
+        # Visitor. Duas primeiras visitas simultâneas passam pelo exists(), mas
+        # só uma insere a linha — a outra esbarra na restrição única e conta
+        # como repetição.
+        try:
+            with transaction.atomic():
+                Visitor.objects.create(url_id=url.pk, ip=packed_ip)
+                if url.max_clicks:
+                    # O cache guarda unique_clicks, que decide o bloqueio dos próximos visitantes.
+                    purge_redirect_cache(short_code)
+                    if not ShortenedURL.reserve_unique_click(url.pk, short_code):
+                        # Sem vaga, o IP não visitou: desfaz a linha de Visitor.
+                        transaction.set_rollback(True)
+                        url.unique_clicks = url.max_clicks
+                        return _blocked_response(request, "max_clicks", short_code, 403, url=url)
+                else:
+                    ShortenedURL.objects.filter(pk=url.pk).update(
+                        total_clicks=F("total_clicks") + 1,
+                        unique_clicks=F("unique_clicks") + 1,
+                        updated_at=timezone.now(),
+                    )
+        except IntegrityError:
+            is_unique = False
+
+    if not is_unique:
         ShortenedURL.objects.filter(pk=url.pk).update(
-            total_clicks=F("total_clicks") + 1, unique_clicks=F("unique_clicks") + 1
+            total_clicks=F("total_clicks") + 1, updated_at=timezone.now()
+        )
+
+    # O primeiro clique de cada IP é sempre gravado; só as repetições entram
+    # na amostragem.
+    weight = 1 if is_unique else _sample_weight(url.click_sample_rate or settings.CLICK_SAMPLE_RATE)
+
+    if weight:
+        Click.objects.create(
+            url_id=url.pk,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            referer=referer,
+            weight=weight,
         )
-    else:
-        ShortenedURL.objects.filter(pk=url.pk).update(total_clicks=F("total_clicks") + 1)
 
     return redirect(url.original_url)